@@ -0,0 +1,176 @@
+"""
+ai_cache.py
+Small on-disk LRU cache for AI results, keyed by a hash of the canvas pixels (+ hint).
+
+Repeat clicks of "AI Fix" / "AI Playable" on an unchanged canvas return the earlier
+result instead of paying for another multi-second API round-trip.
+
+Usage (Python):
+    from ai_cache import AICache
+    cache = AICache()                                   # ~/.umeda_cache, 50 entries
+    key = AICache.make_key(canvas_bytes, "fix", prompt)
+    hit = cache.get(key)                                # cached PNG path or None
+    cache.put(key, out_png)                             # copies the file into the cache
+
+Entries are plain files named after the key; "least recently used" is tracked by mtime
+(a hit touches the file), and the oldest entries beyond max_entries are deleted on put.
+
+HintCache extends AI Playable reuse to *reworded* hints on the same canvas (see below).
+"""
+
+from __future__ import annotations
+import os, re, json, hashlib, shutil, sqlite3, threading
+from pathlib import Path
+from typing import Optional, Dict, Any, Union
+
+import numpy as np
+
+try:
+    from sentence_transformers import SentenceTransformer  # type: ignore
+except ImportError:
+    SentenceTransformer = None  # hints then match only when equal after normalising
+
+DEFAULT_CACHE_DIR = Path.home() / ".umeda_cache"
+
+
+class AICache:
+    def __init__(self, root: Optional[Union[str, Path]] = None, max_entries: int = 50):
+        self.root = Path(root) if root else DEFAULT_CACHE_DIR
+        self.max_entries = max_entries
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: Union[bytes, str]) -> str:
+        """Hash raw pixel bytes and any extra strings (mode, prompt, hint) into one key."""
+        h = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            data = part.encode("utf-8") if isinstance(part, str) else part
+            h.update(len(data).to_bytes(8, "little"))  # keep ("ab", "c") != ("a", "bc")
+            h.update(data)
+        return h.hexdigest()
+
+    def _entry(self, key: str) -> Optional[Path]:
+        for p in self.root.glob(f"{key}.*"):
+            return p
+        return None
+
+    def _touch(self, p: Path) -> None:
+        try:
+            os.utime(p)
+        except OSError:
+            pass
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached file path for key (marking it recently used), or None."""
+        p = self._entry(key)
+        if p is None:
+            return None
+        self._touch(p)
+        return str(p)
+
+    def put(self, key: str, path: str) -> str:
+        """Copy path into the cache under key (keeping its suffix); returns the cached path."""
+        dst = self.root / f"{key}{Path(path).suffix}"
+        shutil.copyfile(path, dst)
+        self._evict()
+        return str(dst)
+
+    def get_json(self, key: str) -> Optional[Dict[str, Any]]:
+        p = self.root / f"{key}.json"
+        try:
+            data = json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        self._touch(p)
+        return data
+
+    def put_json(self, key: str, data: Dict[str, Any]) -> None:
+        (self.root / f"{key}.json").write_text(json.dumps(data, indent=2), encoding="utf-8")
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = [p for p in self.root.iterdir() if p.is_file()]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda p: p.stat().st_mtime)
+        for p in entries[:len(entries) - self.max_entries]:
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+
+class HintCache:
+    """
+    Reuse AI Playable results when the canvas is unchanged and the hint only differs in
+    wording ("a bouncy ball" vs "bouncy ball!"). Rows (canvas_hash, hint, embedding,
+    result) live in SQLite; a lookup takes the stored hint for that canvas with the
+    highest cosine similarity, if it exceeds `threshold`.
+
+    Embeddings come from sentence-transformers (all-MiniLM-L6-v2, CPU is fine) when it is
+    installed; without it, hints match only when equal after lower-casing and dropping
+    punctuation/extra whitespace. Safe to call from worker threads.
+    """
+
+    def __init__(self, db_path: Optional[Union[str, Path]] = None, threshold: float = 0.92,
+                 model_name: str = "sentence-transformers/all-MiniLM-L6-v2", max_rows: int = 1000):
+        # In a subdirectory so AICache eviction (plain files in the root) never removes it
+        self.db_path = str(db_path or DEFAULT_CACHE_DIR / "hints" / "hints.sqlite3")
+        self.threshold = threshold
+        self.model_name = model_name
+        self.max_rows = max_rows
+        self._model = None
+        self._lock = threading.Lock()
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS hints ("
+                       "canvas_hash TEXT, norm_hint TEXT, embedding BLOB, result TEXT)")
+            db.execute("CREATE INDEX IF NOT EXISTS hints_canvas ON hints (canvas_hash)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=5.0)
+
+    @staticmethod
+    def _normalize(hint: str) -> str:
+        return " ".join(re.findall(r"\w+", hint.lower()))
+
+    def _embed(self, hint: str) -> Optional[np.ndarray]:
+        if SentenceTransformer is None:
+            return None
+        with self._lock:
+            if self._model is None:
+                self._model = SentenceTransformer(self.model_name)
+            emb = self._model.encode([hint], normalize_embeddings=True)[0]
+        return np.asarray(emb, dtype=np.float32)
+
+    def lookup(self, canvas_hash: str, hint: str) -> Optional[Dict[str, Any]]:
+        norm = self._normalize(hint)
+        with self._connect() as db:
+            rows = db.execute("SELECT norm_hint, embedding, result FROM hints WHERE canvas_hash = ?",
+                              (canvas_hash,)).fetchall()
+        if not rows:
+            return None
+        for row_norm, _, result in rows:
+            if row_norm == norm:
+                return json.loads(result)
+
+        emb = self._embed(hint)
+        if emb is None:
+            return None
+        stored = [(np.frombuffer(blob, dtype=np.float32), result) for _, blob, result in rows if blob]
+        if not stored:
+            return None
+        sims = np.stack([e for e, _ in stored]) @ emb  # embeddings are unit-length
+        best = int(np.argmax(sims))
+        if sims[best] <= self.threshold:
+            return None
+        return json.loads(stored[best][1])
+
+    def add(self, canvas_hash: str, hint: str, result: Dict[str, Any]) -> None:
+        emb = self._embed(hint)
+        with self._connect() as db:
+            db.execute("INSERT INTO hints VALUES (?, ?, ?, ?)",
+                       (canvas_hash, self._normalize(hint),
+                        emb.tobytes() if emb is not None else None, json.dumps(result)))
+            db.execute("DELETE FROM hints WHERE rowid NOT IN "
+                       "(SELECT rowid FROM hints ORDER BY rowid DESC LIMIT ?)", (self.max_rows,))
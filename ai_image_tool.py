@@ -13,7 +13,7 @@ Env:   export OPENAI_API_KEY=sk-...
 
 from __future__ import annotations
 import os, base64, mimetypes, tempfile
-from typing import Optional
+from typing import Optional, Union, Callable
 from openai import OpenAI, BadRequestError
 
 
@@ -69,35 +69,56 @@ def _extract_image_b64(resp) -> Optional[str]:
 
 
 
-def generate_image_with_gpt5(image_path: str, prompt: str) -> str:
+def generate_image_with_gpt5(image_path: Union[str, bytes], prompt: str,
+                             on_partial: Optional[Callable[[bytes], None]] = None,
+                             partial_images: int = 2) -> str:
     """
     Call GPT-5 with the image_generation tool using your local image + prompt.
+    image_path may also be the PNG bytes themselves (e.g. an in-memory canvas snapshot).
+    If on_partial is given, the response is streamed and on_partial(png_bytes) is called
+    with each partial preview (up to partial_images, max 3) before the final image.
     Returns a path to a temporary PNG.
     """
-    if not os.path.isfile(image_path):
-        raise FileNotFoundError(f"No file at: {image_path}")
-
-    mime = _guess_mime(image_path)
-    with open(image_path, "rb") as f:
-        b64_input = base64.b64encode(f.read()).decode("utf-8")
+    if isinstance(image_path, (bytes, bytearray)):
+        mime = "image/png"
+        b64_input = base64.b64encode(image_path).decode("utf-8")
+    else:
+        if not os.path.isfile(image_path):
+            raise FileNotFoundError(f"No file at: {image_path}")
+        mime = _guess_mime(image_path)
+        with open(image_path, "rb") as f:
+            b64_input = base64.b64encode(f.read()).decode("utf-8")
     data_url = f"data:{mime};base64,{b64_input}"
 
     client = OpenAI()
 
+    request = dict(
+        model="gpt-5",
+        input=[{
+            "role": "user",
+            "content": [
+                {"type": "input_text", "text": prompt},
+                # IMPORTANT: use image_url (data URL), not "image"
+                {"type": "input_image", "image_url": data_url},
+            ],
+        }],
+        tools=[{"type": "image_generation"}],
+        #tool_choice={"type": "auto"},
+    )
     try:
-        resp = client.responses.create(
-            model="gpt-5",
-            input=[{
-                "role": "user",
-                "content": [
-                    {"type": "input_text", "text": prompt},
-                    # IMPORTANT: use image_url (data URL), not "image"
-                    {"type": "input_image", "image_url": data_url},
-                ],
-            }],
-            tools=[{"type": "image_generation"}],
-            #tool_choice={"type": "auto"},
-        )
+        if on_partial is None:
+            resp = client.responses.create(**request)
+        else:
+            request["tools"] = [{"type": "image_generation", "partial_images": partial_images}]
+            resp = None
+            for event in client.responses.create(stream=True, **request):
+                etype = getattr(event, "type", "")
+                if etype == "response.image_generation_call.partial_image":
+                    on_partial(base64.b64decode(event.partial_image_b64))
+                elif etype == "response.completed":
+                    resp = event.response
+            if resp is None:
+                raise RuntimeError("Image stream ended without a completed response.")
     except BadRequestError as e:
         # Surface the server’s message (super helpful when shapes drift)
         raise RuntimeError(f"OpenAI request failed: {getattr(e, 'message', str(e))}") from e
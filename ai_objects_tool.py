@@ -24,7 +24,7 @@ from __future__ import annotations
 import os, re, base64, mimetypes
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Union
 from openai import OpenAI, BadRequestError
 
 
@@ -104,21 +104,24 @@ Another example would be a UFO, which should hover and move when dragged, and di
 
 """
 
-def generate_game_objects_module(image_path: str,
+def generate_game_objects_module(image_path: Union[str, bytes],
                                  user_hint: str = "",
                                  out_dir: str | None = "games",
                                  base_name: str = "objects") -> str:
     """
-    Ask GPT-5 to generate a game-objects module from an image.
+    Ask GPT-5 to generate a game-objects module from an image (a path, or PNG bytes).
     Returns a file path like ./games/objects_YYYYmmdd_HHMMSS.py
     """
-    p = Path(image_path)
-    if not p.is_file():
-        raise FileNotFoundError(f"No file at: {image_path}")
-
-    mime = _guess_mime(image_path)
-    with open(image_path, "rb") as f:
-        b64_input = base64.b64encode(f.read()).decode("utf-8")
+    if isinstance(image_path, (bytes, bytearray)):
+        mime = "image/png"
+        b64_input = base64.b64encode(image_path).decode("utf-8")
+    else:
+        p = Path(image_path)
+        if not p.is_file():
+            raise FileNotFoundError(f"No file at: {image_path}")
+        mime = _guess_mime(image_path)
+        with open(image_path, "rb") as f:
+            b64_input = base64.b64encode(f.read()).decode("utf-8")
     data_url = f"data:{mime};base64,{b64_input}"
 
     prompt = _DEFAULT_USER_INSTRUCTIONS
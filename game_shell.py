@@ -14,6 +14,13 @@ Contract for the *game objects* module (the piece GPT will generate later):
 
     - 'context' is a dict you can use (e.g., audio helpers below).
 
+    - Optional: a game exposing a `dirty_rects` list attribute opts into
+      incremental rendering. The shell then blits the background only once and,
+      after each draw(), pushes just those rects to the display. Such a game must
+      restore the background under anything it moves itself. On frames where the
+      shell repaints the whole background (the first one, window exposes) it sets
+      `dirty_rects = None` before draw(): the game must then draw everything.
+
 This boilerplate:
     - Loads the background, sets the window size to match.
     - Dynamically imports your module by *file path* (or runs a safe fallback demo).
@@ -71,18 +78,27 @@ def init_audio(force_channels=1):
 
 def make_sound_from_wave(wave_float, volume=0.6):
     """
-    wave_float: 1-D numpy array in [-1.0, 1.0]
+    wave_float: 1-D numpy array in [-1.0, 1.0], or int16 PCM which is used as-is
+                (scaled by volume only when volume != 1.0)
     Returns a pygame.Sound shaped to the current mixer channels.
     """
     if np is None:
         raise RuntimeError("numpy required for audio synthesis")
-    mono = (np.clip(wave_float * volume, -1.0, 1.0) * (2**15 - 1)).astype("int16")
+    if wave_float.dtype == np.int16:
+        pcm = wave_float if volume == 1.0 else wave_float * volume
+    else:
+        # One float temporary, clipped and scaled in place
+        pcm = wave_float * volume
+        np.clip(pcm, -1.0, 1.0, out=pcm)
+        pcm *= 2**15 - 1
     mi = pygame.mixer.get_init()  # (freq, size, channels)
     channels = mi[2] if mi else 2
-    if channels == 1:
-        audio = mono
+    if channels == 1 and pcm.dtype == np.int16:
+        audio = pcm
     else:
-        audio = np.repeat(mono[:, None], channels, axis=1)
+        # Cast to int16 and fan out to every channel in a single copy
+        audio = np.empty(pcm.shape if channels == 1 else (len(pcm), channels), dtype=np.int16)
+        np.copyto(audio, pcm if channels == 1 else pcm[:, None], casting="unsafe")
     return pygame.sndarray.make_sound(audio)
 
 # ---------- Module loading ----------
@@ -131,12 +147,17 @@ class _FallbackGame:
         txt = self.font.render(self.msg, True, (0, 0, 0))
         screen.blit(txt, (10, 10))
 
-def main():
-    img_path, module_path, sprite_path, sprite_x, sprite_y, components_path = _parse_args(sys.argv)
+def run(argv) -> int:
+    """
+    Run the shell in-process. argv is sys.argv-shaped (argv[0] is ignored), so a
+    caller that already has Python, pygame and numpy loaded can skip a new interpreter.
+    Returns the process exit code instead of calling sys.exit.
+    """
+    img_path, module_path, sprite_path, sprite_x, sprite_y, components_path = _parse_args(argv)
     if not img_path or not module_path:
         print("Usage: python game_shell.py bg.png --module path/to/objects.py "
               "[--sprite sprite.png --sprite-x N --sprite-y N] [--components components.json]")
-        sys.exit(2)
+        return 2
 
     pygame.init()
     init_audio(force_channels=1)
@@ -147,7 +168,8 @@ def main():
         W, H = probe.get_size()
     except Exception as e:
         print("Failed to load image:", e)
-        sys.exit(1)
+        pygame.quit()
+        return 1
 
     screen = pygame.display.set_mode((W, H))
     pygame.display.set_caption("Pygame Boiler")
@@ -254,6 +276,8 @@ def main():
 
     # ---- Main loop ----
     clock = pygame.time.Clock()
+    dirty_mode = hasattr(game, "dirty_rects")
+    full_redraw = True
     running = True
     while running:
         dt = clock.tick(60) / 1000.0
@@ -264,6 +288,8 @@ def main():
             elif e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
                 running = False
             else:
+                if e.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    full_redraw = True  # uncovered/restored: dirty rects alone leave it stale
                 try:
                     game.handle_event(e)
                 except Exception as ex:
@@ -274,15 +300,36 @@ def main():
         except Exception as ex:
             print("update error:", ex)
 
-        screen.blit(background, (0, 0))
+        if full_redraw or not dirty_mode:
+            screen.blit(background, (0, 0))
+            if dirty_mode:
+                game.dirty_rects = None  # tell the game to draw everything this frame
         try:
             game.draw(screen)
         except Exception as ex:
             print("draw error:", ex)
 
-        pygame.display.flip()
+        if full_redraw or not dirty_mode:
+            pygame.display.flip()
+            full_redraw = False
+        elif game.dirty_rects:
+            pygame.display.update(game.dirty_rects)
 
     pygame.quit()
+    return 0
+
+def main():
+    try:
+        code = run(sys.argv)
+    finally:
+        # Set by a launcher that exec'd into this process and can't clean up after us
+        cleanup_path = os.environ.pop("UMEDA_CLEANUP_PATH", None)
+        if cleanup_path:
+            try:
+                os.remove(cleanup_path)
+            except OSError:
+                pass
+    sys.exit(code)
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,7 @@
 import pygame
 import math
+import queue
+import threading
 import numpy as np
 
 def create_game(screen, background_surf, context):
@@ -10,12 +12,26 @@ def create_game(screen, background_surf, context):
       draw(screen)
     '''
     class BouncyBallGame:
-        def __init__(self, screen, context):
+        _RING_CAP = 64  # drag sample ring size (power of two so the head wraps with a mask)
+
+        # Fixed attribute layout: no per-instance __dict__, cheaper attribute access
+        __slots__ = (
+            'surf', 'rect', 'initial_rect', 'background_surf', '_rect_center', 'posx', 'posy', 'vx', 'vy',
+            'gravity_on', 'gravity', 'restitution', 'linear_drag', 'nudge_accel', '_drag_dt', '_drag_factor',
+            'pause', 'asleep', 'dragging', 'drag_offset', '_pending_mouse', 'drag_samples', '_ring_head',
+            '_ring_count', 'sample_window', '_frame_time_s', 'screen_rect', 'halfw', 'halfh', 'audio_ok',
+            'last_bounce_sound_t', 'SAMPLE_RATE', 'make_sound_from_wave', '_audio_q', '_env', '_pitch_drop',
+            '_wave_f32', '_wave_i16', '_last_rect', 'dirty_rects', '_update_fn', '_g_eff'
+        )
+
+        def __init__(self, screen, background_surf, context):
             assert "sprite" in context and context["sprite"], "sprite required in context"
             spr = context["sprite"]
             self.surf = spr["surface"]
             self.rect = spr["rect"].copy()
             self.initial_rect = self.rect.copy()
+            self.background_surf = background_surf
+            self._rect_center = None  # integer center last written to rect
 
             # Physics state (track center as floats)
             self.posx, self.posy = float(self.rect.centerx), float(self.rect.centery)
@@ -26,16 +42,24 @@ def create_game(screen, background_surf, context):
             self.gravity = 1800.0  # px/s^2
             self.restitution = 0.82  # bounciness
             self.linear_drag = 1.2   # per second coefficient for air drag
+            self.nudge_accel = 1200.0  # px/s^2 while an arrow key is held
+            self._drag_dt = -1.0     # dt the cached drag factor was computed for
+            self._drag_factor = 1.0
             self.pause = False
+            self.asleep = False  # settled with no input; update() is a no-op until woken
 
             # Dragging/throwing
             self.dragging = False
             self.drag_offset = (0.0, 0.0)
-            self.drag_samples = []  # (t_sec, x, y)
+            self._pending_mouse = None  # last drag MOUSEMOTION pos this frame, applied in update()
+            self.drag_samples = np.empty((self._RING_CAP, 3), dtype=np.float64)  # ring of (t_sec, x, y)
+            self._ring_head = 0
+            self._ring_count = 0
             self.sample_window = 0.15  # seconds to consider when computing throw
+            self._frame_time_s = 0.0   # advanced once per update(); stamps samples without get_ticks()
 
             # Bounds
-            self.screen_rect = screen.get_rect()
+            self.screen_rect = screen.get_rect()  # cached; refreshed on VIDEORESIZE
             self.halfw = self.rect.width * 0.5
             self.halfh = self.rect.height * 0.5
 
@@ -50,78 +74,120 @@ def create_game(screen, background_surf, context):
             except Exception:
                 self.audio_ok = False
 
+            # Bounce sounds are synthesized and played on a worker so the main loop never stalls
+            self._audio_q = queue.Queue(maxsize=8)
+            self._env = self._pitch_drop = None
+            self._wave_f32 = self._wave_i16 = None
+            if self.audio_ok:
+                # Fade and pitch-drop ramps for the longest bounce (105 ms); each sound slices a prefix
+                max_n = int(self.SAMPLE_RATE * 0.105) + 1
+                self._env = np.linspace(1.0, 0.85, max_n, dtype=np.float32)
+                self._pitch_drop = np.linspace(1.0, 0.92, max_n, dtype=np.float32)
+                # Scratch buffers: synthesize straight to int16 PCM (worker-only, so reuse is safe)
+                self._wave_f32 = np.empty(max_n, dtype=np.float32)
+                self._wave_i16 = np.empty(max_n, dtype=np.int16)
+                threading.Thread(target=self._audio_worker, daemon=True).start()
+
+            # Dirty-rect rendering: the shell pushes only these rects to the display
+            self._last_rect = None
+            self.dirty_rects = []
+
+            # Per-frame update handler for the current state (see _select_update)
+            self._update_fn = None
+            self._g_eff = 0.0
+            self._select_update()
+
         # -------------- Helpers --------------
         def _apply_bounds_and_bounce(self):
-            bounced = False
-            now_ms = pygame.time.get_ticks()
-
-            # Left/Right
+            # Clamp both axes in one go; a coordinate that moved means an edge was hit
             minx = self.screen_rect.left + self.halfw
             maxx = self.screen_rect.right - self.halfw
-            if self.posx < minx:
-                self.posx = minx
-                if self.vx < 0:
-                    self.vx = -self.vx * self.restitution
-                    bounced = True
-            elif self.posx > maxx:
-                self.posx = maxx
-                if self.vx > 0:
-                    self.vx = -self.vx * self.restitution
-                    bounced = True
-
-            # Top/Bottom
             miny = self.screen_rect.top + self.halfh
             maxy = self.screen_rect.bottom - self.halfh
-            if self.posy < miny:
-                self.posy = miny
-                if self.vy < 0:
-                    self.vy = -self.vy * self.restitution
-                    bounced = True
-            elif self.posy > maxy:
-                self.posy = maxy
-                if self.vy > 0:
-                    self.vy = -self.vy * self.restitution
-                    bounced = True
+            cx = max(minx, min(self.posx, maxx))
+            cy = max(miny, min(self.posy, maxy))
+
+            # Only bounce when moving into the edge: the clamp shift and velocity have opposite signs
+            bounce_x = (cx - self.posx) * self.vx < 0.0
+            bounce_y = (cy - self.posy) * self.vy < 0.0
+            on_floor = cy < self.posy
+            self.posx, self.posy = cx, cy
+
+            if bounce_x:
+                self.vx = -self.vx * self.restitution
+            if bounce_y:
+                self.vy = -self.vy * self.restitution
+                if on_floor:
                     # Tiny ground friction when touching floor
                     self.vx *= 0.985
                     if abs(self.vy) < 18:
                         self.vy = 0.0
                     if abs(self.vx) < 12:
                         self.vx = 0.0
+            bounced = bounce_x or bounce_y
 
             if bounced:
-                speed = math.hypot(self.vx, self.vy)
-                if self.audio_ok and speed > 120 and now_ms - self.last_bounce_sound_t > 40:
-                    self._play_bounce_sound(speed)
+                now_ms = self._frame_time_s * 1000.0
+                # Compare squared speed; the sqrt is only needed on the rare sound path
+                speed_sq = self.vx * self.vx + self.vy * self.vy
+                if self.audio_ok and speed_sq > 120 * 120 and now_ms - self.last_bounce_sound_t > 40:
+                    self._play_bounce_sound(math.sqrt(speed_sq))
                     self.last_bounce_sound_t = now_ms
 
         def _play_bounce_sound(self, speed):
+            try:
+                self._audio_q.put_nowait(speed)
+            except queue.Full:
+                pass  # drop bounces while the worker is backed up
+
+        def _audio_worker(self):
+            while True:
+                self._synth_bounce_sound(self._audio_q.get())
+
+        def _synth_bounce_sound(self, speed):
             try:
                 # Simple sine "thup"
                 freq = 220 + min(900, speed * 0.6)
                 dur = 0.035 + min(0.07, speed / 5000.0)
                 t = np.linspace(0, dur, int(self.SAMPLE_RATE * dur), endpoint=False)
                 # Small exponential fade and little pitch drop
-                pitch_drop = np.linspace(1.0, 0.92, t.size)
-                wave = 0.6 * np.sin(2 * np.pi * (freq * pitch_drop) * t) * np.linspace(1.0, 0.85, t.size)
-                snd = self.make_sound_from_wave(wave, volume=0.8)
+                n = t.size
+                pitch_drop = self._pitch_drop[:n]
+                wave = self._wave_f32[:n]
+                np.sin(2 * np.pi * (freq * pitch_drop) * t, out=wave)
+                # amplitude 0.6 at volume 0.8, scaled to int16 full range
+                np.multiply(wave, self._env[:n], out=wave)
+                wave *= 0.6 * 0.8 * 32767
+                np.rint(wave, out=wave)
+                pcm = self._wave_i16[:n]
+                pcm[:] = wave
+                snd = self.make_sound_from_wave(pcm, volume=1.0)
                 snd.play()
             except Exception:
                 pass
 
-        def _record_drag_sample(self, mx, my):
-            t = pygame.time.get_ticks() / 1000.0
-            self.drag_samples.append((t, float(mx), float(my)))
-            # Keep only recent samples
-            while self.drag_samples and t - self.drag_samples[0][0] > self.sample_window:
-                self.drag_samples.pop(0)
+        def _record_drag_sample(self, mx, my, t=None):
+            if t is None:
+                t = self._frame_time_s
+            # O(1) write into the ring; old samples are simply overwritten
+            self.drag_samples[self._ring_head] = (t, mx, my)
+            self._ring_head = (self._ring_head + 1) & (self._RING_CAP - 1)
+            self._ring_count = min(self._RING_CAP, self._ring_count + 1)
+
+        def _clear_drag_samples(self):
+            self._ring_head = 0
+            self._ring_count = 0
 
         def _throw_velocity_from_drag(self):
             # Estimate average velocity over recent window
-            if len(self.drag_samples) < 2:
+            if self._ring_count < 2:
                 return 0.0, 0.0
-            t0, x0, y0 = self.drag_samples[0]
-            t1, x1, y1 = self.drag_samples[-1]
+            # Samples newest-first; times are monotonic so the in-window ones are a prefix
+            order = (self._ring_head - 1 - np.arange(self._ring_count)) & (self._RING_CAP - 1)
+            samples = self.drag_samples[order]
+            t1, x1, y1 = (float(v) for v in samples[0])
+            n = int(np.count_nonzero(samples[:, 0] >= t1 - self.sample_window))
+            t0, x0, y0 = (float(v) for v in samples[n - 1])
             dt = max(1e-4, t1 - t0)
             vx = (x1 - x0) / dt
             vy = (y1 - y0) / dt
@@ -131,15 +197,27 @@ def create_game(screen, background_surf, context):
             vy *= scale
             # Clamp to sane max speed
             max_speed = 2400.0
-            speed = math.hypot(vx, vy)
-            if speed > max_speed:
-                s = max_speed / speed
+            speed_sq = vx * vx + vy * vy
+            if speed_sq > max_speed * max_speed:
+                s = max_speed / math.sqrt(speed_sq)
                 vx *= s
                 vy *= s
             return vx, vy
 
+        def _apply_pending_drag(self):
+            if self._pending_mouse is None:
+                return
+            mx, my = self._pending_mouse
+            self._pending_mouse = None
+            ox, oy = self.drag_offset
+            self.posx = float(mx - ox)
+            self.posy = float(my - oy)
+            self._apply_bounds_and_bounce()  # clamp while dragging
+            self._record_drag_sample(mx, my)
+
         def _reset(self):
             self.rect = self.initial_rect.copy()
+            self._rect_center = None
             self.posx, self.posy = float(self.rect.centerx), float(self.rect.centery)
             self.vx, self.vy = 0.0, 0.0
             self.pause = False
@@ -147,78 +225,130 @@ def create_game(screen, background_surf, context):
         # -------------- Public API --------------
         def handle_event(self, event):
             if event.type == pygame.KEYDOWN:
+                self.asleep = False
                 if event.key == pygame.K_g:
                     self.gravity_on = not self.gravity_on
                 elif event.key == pygame.K_r:
                     self._reset()
                 elif event.key == pygame.K_p:
                     self.pause = not self.pause
-                elif event.key == pygame.K_LEFT:
-                    self.vx -= 220.0
-                elif event.key == pygame.K_RIGHT:
-                    self.vx += 220.0
-                elif event.key == pygame.K_UP:
-                    self.vy -= 220.0
-                elif event.key == pygame.K_DOWN:
-                    self.vy += 220.0
+                self._select_update()
 
             elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                self.asleep = False
                 if self.rect.collidepoint(event.pos):
                     self.dragging = True
                     mx, my = event.pos
                     self.drag_offset = (mx - self.posx, my - self.posy)
                     self.vx = self.vy = 0.0
-                    self.drag_samples.clear()
+                    self._clear_drag_samples()
                     self._record_drag_sample(mx, my)
+                self._select_update()
 
             elif event.type == pygame.MOUSEMOTION and self.dragging:
-                mx, my = event.pos
-                ox, oy = self.drag_offset
-                self.posx = float(mx - ox)
-                self.posy = float(my - oy)
-                self._apply_bounds_and_bounce()  # clamp while dragging
-                self._record_drag_sample(mx, my)
+                # Coalesced: only the frame's last motion is applied, once, in update()
+                self._pending_mouse = event.pos
 
             elif event.type == pygame.MOUSEBUTTONUP and event.button == 1 and self.dragging:
+                self._apply_pending_drag()
                 self.dragging = False
                 vx, vy = self._throw_velocity_from_drag()
                 self.vx, self.vy = vx, vy
-                self.drag_samples.clear()
+                self._clear_drag_samples()
+                self._select_update()
+
+            elif event.type == pygame.VIDEORESIZE:
+                self.screen_rect.size = (event.w, event.h)
+                self.asleep = False
+                self._select_update()
 
         def update(self, dt):
             # dt: seconds
-            if self.pause:
-                # Keep rect in sync if window size changes
-                self.rect.center = (round(self.posx), round(self.posy))
-                return
+            self._frame_time_s += dt
+            self._update_fn(dt)
+
+        def _select_update(self):
+            # Pick the per-frame handler once whenever state changes, instead of
+            # re-testing the sleep/drag/pause/gravity flags every frame
+            if self.dragging:
+                self._update_fn = self._update_dragging
+            elif self.pause:
+                self._update_fn = self._update_paused
+            elif self.asleep:
+                self._update_fn = self._update_asleep
+            else:
+                self._update_fn = self._update_physics
+            self._g_eff = self.gravity if self.gravity_on else 0.0
+
+        def _update_asleep(self, dt):
+            pass
 
-            if not self.dragging:
-                if self.gravity_on:
-                    self.vy += self.gravity * dt
+        def _update_paused(self, dt):
+            # Keep rect in sync if window size changes
+            self._sync_rect()
 
-                # Air drag
-                drag_factor = math.exp(-self.linear_drag * dt)
-                self.vx *= drag_factor
-                self.vy *= drag_factor
+        def _update_dragging(self, dt):
+            self._apply_pending_drag()
+            self._sync_rect()
 
-                # Integrate position
-                self.posx += self.vx * dt
-                self.posy += self.vy * dt
+        def _update_physics(self, dt):
+            # Arrow keys push the ball while held (polled once per frame, scaled by dt)
+            keys = pygame.key.get_pressed()
+            self.vx += (keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]) * self.nudge_accel * dt
+            self.vy += (keys[pygame.K_DOWN] - keys[pygame.K_UP]) * self.nudge_accel * dt
 
-                # Collisions with window edges
-                self._apply_bounds_and_bounce()
+            # Air drag (frame dt is nearly constant, so exp() is cached)
+            if dt != self._drag_dt:
+                self._drag_factor = math.exp(-self.linear_drag * dt)
+                self._drag_dt = dt
 
-                # Sleep small velocities to stop jitter
-                if abs(self.vx) < 5:
-                    self.vx = 0.0
-                if abs(self.vy) < 5 and abs(self.posy - (self.screen_rect.bottom - self.halfh)) < 0.5:
-                    self.vy = 0.0
+            # Gravity and drag on velocity, then integrate position (semi-implicit Euler)
+            drag = self._drag_factor
+            vx = self.vx * drag
+            vy = (self.vy + self._g_eff * dt) * drag
+            self.vx = vx
+            self.vy = vy
+            self.posx += vx * dt
+            self.posy += vy * dt
+
+            # Collisions with window edges
+            self._apply_bounds_and_bounce()
+
+            # Sleep small velocities to stop jitter
+            if abs(self.vx) < 5:
+                self.vx = 0.0
+            maxy = self.screen_rect.bottom - self.halfh
+            if abs(self.vy) < 5 and abs(self.posy - maxy) < 0.5:
+                self.vy = 0.0
+
+            # Nothing will move until input arrives
+            self.asleep = ((not self.gravity_on or self.posy >= maxy - 0.5)
+                           and abs(self.vx) < 1e-3 and abs(self.vy) < 1e-3)
+            if self.asleep:
+                self._update_fn = self._update_asleep
 
             # Sync rect with float center
-            self.rect.center = (round(self.posx), round(self.posy))
+            self._sync_rect()
+
+        def _sync_rect(self):
+            # Skip the Rect write while the rounded center hasn't moved (slow/settling motion)
+            center = (round(self.posx), round(self.posy))
+            if center != self._rect_center:
+                self.rect.center = center
+                self._rect_center = center
 
         def draw(self, screen):
-            # background already drawn by the environment
+            # The shell blits the background on full redraws (dirty_rects is None then);
+            # otherwise only repaint when the sprite moved, restoring the background
+            # under its previous rect
+            if self._last_rect is not None and self.dirty_rects is not None:
+                if self.rect == self._last_rect:
+                    self.dirty_rects = []
+                    return
+                screen.blit(self.background_surf, self._last_rect, self._last_rect)
             screen.blit(self.surf, self.rect)
+            new_rect = self.rect.copy()
+            self.dirty_rects = [new_rect] if self._last_rect is None else [self._last_rect, new_rect]
+            self._last_rect = new_rect
 
-    return BouncyBallGame(screen, context)
+    return BouncyBallGame(screen, background_surf, context)
@@ -1,4 +1,6 @@
 import math
+import queue
+import threading
 import pygame
 import numpy as np
 
@@ -10,8 +12,23 @@ def create_game(screen, background_surf, context):
       draw(screen)           # draw your overlays/sprites; background is already drawn
     '''
     class BouncyBallGame:
+        _RING_CAP = 64  # drag history ring size (power of two so the head wraps with a mask)
+        _STEP = 1.0 / 240.0  # fixed physics substep (s)
+
+        # Fixed attribute layout: no per-instance __dict__, cheaper attribute access
+        __slots__ = (
+            'screen', '_sw', '_sh', 'background_surf', 'surf', 'rect', 'initial_rect', '_rect_topleft', 'px',
+            'py', 'vx', 'vy', 'gravity_on', 'gravity', 'restitution', 'air_drag', 'floor_friction',
+            'sleep_threshold', '_accum', '_drag_factor', '_floor_friction_step', 'dragging',
+            'drag_offset_center', '_pending_mouse', '_frame_time_s', 'drag_history', '_ring_head',
+            '_ring_count', 'paused', 'asleep', 'SAMPLE_RATE', 'make_sound_from_wave', 'last_bounce_time',
+            '_audio_q', '_click_t', '_click_env', '_wave_f32', '_wave_i16', '_last_rect', 'dirty_rects',
+            '_update_fn', '_g_eff'
+        )
+
         def __init__(self, screen, background_surf, context):
             self.screen = screen
+            self._sw, self._sh = screen.get_size()  # cached; refreshed on VIDEORESIZE
             self.background_surf = background_surf
 
             # Required sprite elements
@@ -19,24 +36,35 @@ def create_game(screen, background_surf, context):
             self.surf = sp['surface']
             self.rect = sp['rect']            # keep reference, do not replace
             self.initial_rect = self.rect.copy()
+            self._rect_topleft = self.rect.topleft  # integer topleft last written to rect
 
-            # Physics state
-            self.pos = pygame.Vector2(self.rect.topleft)  # float position (topleft)
-            self.vel = pygame.Vector2(0, 0)
+            # Physics state as plain floats (topleft position, velocity)
+            self.px, self.py = float(self.rect.x), float(self.rect.y)
+            self.vx, self.vy = 0.0, 0.0
 
             # Tunable physics parameters
             self.gravity_on = True
             self.gravity = 1400.0           # px/s^2
             self.restitution = 0.78         # bounciness
             self.air_drag = 0.14            # per-second air resistance
-            self.floor_friction = 0.9       # applied on floor hits
+            self.floor_friction = 0.9       # applied on floor hits (tuned per 60 Hz frame)
             self.sleep_threshold = 28.0     # speed threshold to stop tiny bounces
 
+            # Fixed-step integration: per-substep factors are constant, so compute them once
+            self._accum = 0.0
+            self._drag_factor = math.exp(-self.air_drag * self._STEP)
+            self._floor_friction_step = self.floor_friction ** (self._STEP * 60.0)
+
             # Interaction
             self.dragging = False
             self.drag_offset_center = pygame.Vector2(0, 0)
-            self.drag_history = []          # list of (time_sec, center_pos)
+            self._pending_mouse = None      # last drag MOUSEMOTION pos this frame, applied in update()
+            self._frame_time_s = 0.0        # advanced once per update(); stamps drag points
+            self.drag_history = np.empty((self._RING_CAP, 3), dtype=np.float64)  # ring of (time_sec, cx, cy)
+            self._ring_head = 0
+            self._ring_count = 0
             self.paused = False
+            self.asleep = False             # settled with no input; update() is a no-op until woken
 
             # Audio helpers (optional)
             audio = context.get("audio", {})
@@ -44,9 +72,33 @@ def create_game(screen, background_surf, context):
             self.make_sound_from_wave = audio.get("make_sound_from_wave", None)
             self.last_bounce_time = 0  # ms
 
+            # Bounce sounds are synthesized and played on a worker so the main loop never stalls
+            self._audio_q = queue.Queue(maxsize=8)
+            self._click_t = self._click_env = None
+            self._wave_f32 = self._wave_i16 = None
+            if self.SAMPLE_RATE and self.make_sound_from_wave:
+                # Every click is 45 ms long, so its time base and fade are built once
+                n = int(self.SAMPLE_RATE * 0.045)
+                self._click_t = np.linspace(0, 0.045, n, endpoint=False)
+                self._click_env = np.linspace(1, 0.9, n, dtype=np.float32)
+                # Scratch buffers: synthesize straight to int16 PCM (worker-only, so reuse is safe)
+                self._wave_f32 = np.empty(n, dtype=np.float32)
+                self._wave_i16 = np.empty(n, dtype=np.int16)
+                threading.Thread(target=self._audio_worker, daemon=True).start()
+
+            # Dirty-rect rendering: the shell pushes only these rects to the display
+            self._last_rect = None
+            self.dirty_rects = []
+
+            # Per-frame update handler for the current state (see _select_update)
+            self._update_fn = None
+            self._g_eff = 0.0
+            self._select_update()
+
         # ----- Utility/audio -----
         def _now(self):
-            return pygame.time.get_ticks() / 1000.0
+            # Frame-cached clock: every drag point in a frame shares one timestamp
+            return self._frame_time_s
 
         def _play_bounce(self, impact_speed):
             if not (self.SAMPLE_RATE and self.make_sound_from_wave):
@@ -56,22 +108,44 @@ def create_game(screen, background_surf, context):
             if now_ms - self.last_bounce_time < 50:
                 return
             self.last_bounce_time = now_ms
+            try:
+                self._audio_q.put_nowait(impact_speed)
+            except queue.Full:
+                pass  # drop bounces while the worker is backed up
+
+        def _audio_worker(self):
+            while True:
+                impact_speed = self._audio_q.get()
+                try:
+                    self._synth_bounce(impact_speed)
+                except Exception:
+                    pass  # never let a bad sound kill the worker
 
+        def _synth_bounce(self, impact_speed):
             # Short click with freq based on impact
-            dur = 0.045
             speed = max(0.0, min(impact_speed, 2200.0))
             freq = 180 + 520 * (speed / 2200.0)
-            t = np.linspace(0, dur, int(self.SAMPLE_RATE * dur), endpoint=False)
-            wave = 0.6 * np.sin(2 * np.pi * freq * t) * np.linspace(1, 0.9, t.size)
-            snd = self.make_sound_from_wave(wave, volume=0.7)
+            wave = self._wave_f32
+            np.sin((2 * np.pi * freq) * self._click_t, out=wave)
+            # amplitude 0.6 at volume 0.7, scaled to int16 full range
+            np.multiply(wave, self._click_env, out=wave)
+            wave *= 0.6 * 0.7 * 32767
+            np.rint(wave, out=wave)
+            self._wave_i16[:] = wave
+            snd = self.make_sound_from_wave(self._wave_i16, volume=1.0)
             snd.play()
 
         def _update_rect_from_pos(self):
-            self.rect.topleft = (int(round(self.pos.x)), int(round(self.pos.y)))
+            # Skip the Rect write while the rounded position hasn't moved (slow/settling motion)
+            topleft = (int(round(self.px)), int(round(self.py)))
+            if topleft != self._rect_topleft:
+                self.rect.topleft = topleft
+                self._rect_topleft = topleft
 
         # ----- Event handling -----
         def handle_event(self, event):
             if event.type == pygame.KEYDOWN:
+                self.asleep = False
                 if event.key == pygame.K_g:
                     self.gravity_on = not self.gravity_on
                 elif event.key == pygame.K_p:
@@ -82,145 +156,199 @@ def create_game(screen, background_surf, context):
                     # Arrow key nudges
                     nudge = 8
                     if event.key == pygame.K_LEFT:
-                        self.pos.x -= nudge
+                        self.px -= nudge
                     elif event.key == pygame.K_RIGHT:
-                        self.pos.x += nudge
+                        self.px += nudge
                     elif event.key == pygame.K_UP:
-                        self.pos.y -= nudge
+                        self.py -= nudge
                     elif event.key == pygame.K_DOWN:
-                        self.pos.y += nudge
+                        self.py += nudge
                     self._update_rect_from_pos()
+                self._select_update()
 
             elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                self.asleep = False
                 if self.rect.collidepoint(event.pos):
                     self.dragging = True
-                    mouse = pygame.Vector2(event.pos)
-                    self.drag_offset_center = mouse - pygame.Vector2(self.rect.center)
-                    self.drag_history.clear()
-                    self.vel.update(0, 0)  # while dragging, stop motion
+                    mx, my = event.pos
+                    cx, cy = self.rect.center
+                    self.drag_offset_center.update(mx - cx, my - cy)  # in place, no temporaries
+                    self._clear_drag_history()
+                    self.vx = self.vy = 0.0  # while dragging, stop motion
                     # seed history
-                    self._record_drag_point(mouse)
+                    self._record_drag_point(event.pos)
+                self._select_update()
 
             elif event.type == pygame.MOUSEMOTION and self.dragging:
-                mouse = pygame.Vector2(event.pos)
-                center = mouse - self.drag_offset_center
-                self.rect.center = (int(round(center.x)), int(round(center.y)))
-                self.pos.update(self.rect.topleft)
-                self._record_drag_point(mouse)
+                # Coalesced: only the frame's last motion is applied, once, in update()
+                self._pending_mouse = event.pos
 
             elif event.type == pygame.MOUSEBUTTONUP and event.button == 1 and self.dragging:
+                self._apply_pending_drag()
                 self.dragging = False
                 # Compute throw velocity from recent pointer movement
-                self.vel = self._compute_throw_velocity()
-                self.drag_history.clear()
-
-        def _record_drag_point(self, mouse_pos):
-            now = self._now()
-            # store center position
-            center = mouse_pos - self.drag_offset_center
-            self.drag_history.append((now, pygame.Vector2(center)))
-            # keep only last ~150 ms
-            cutoff = now - 0.15
-            while len(self.drag_history) > 1 and self.drag_history[0][0] < cutoff:
-                self.drag_history.pop(0)
+                self.vx, self.vy = self._compute_throw_velocity()
+                self._clear_drag_history()
+                self._select_update()
+
+            elif event.type == pygame.VIDEORESIZE:
+                self._sw, self._sh = event.w, event.h
+                self.asleep = False
+                self._select_update()
+
+        def _apply_pending_drag(self):
+            if self._pending_mouse is None:
+                return
+            mouse = self._pending_mouse
+            self._pending_mouse = None
+            cx = mouse[0] - self.drag_offset_center.x
+            cy = mouse[1] - self.drag_offset_center.y
+            self.rect.center = (int(round(cx)), int(round(cy)))
+            self._rect_topleft = self.rect.topleft
+            self.px, self.py = float(self.rect.x), float(self.rect.y)
+            self._record_drag_point(mouse)
+
+        def _record_drag_point(self, mouse_pos, now=None):
+            if now is None:
+                now = self._now()
+            # store center position; O(1) ring write, old points are overwritten
+            self.drag_history[self._ring_head] = (now,
+                                                  mouse_pos[0] - self.drag_offset_center.x,
+                                                  mouse_pos[1] - self.drag_offset_center.y)
+            self._ring_head = (self._ring_head + 1) & (self._RING_CAP - 1)
+            self._ring_count = min(self._RING_CAP, self._ring_count + 1)
+
+        def _clear_drag_history(self):
+            self._ring_head = 0
+            self._ring_count = 0
 
         def _compute_throw_velocity(self):
-            if len(self.drag_history) < 2:
+            if self._ring_count < 2:
+                return pygame.Vector2(0, 0)
+            # History newest-first; only the last ~150 ms counts
+            order = (self._ring_head - 1 - np.arange(self._ring_count)) & (self._RING_CAP - 1)
+            hist = self.drag_history[order]
+            t1 = hist[0, 0]
+            n = int(np.count_nonzero(hist[:, 0] >= t1 - 0.15))
+            if n < 2:
                 return pygame.Vector2(0, 0)
-            t1, p1 = self.drag_history[-1]
             # find an earlier point at least 20 ms before last
-            idx = len(self.drag_history) - 2
-            while idx > 0 and t1 - self.drag_history[idx][0] < 0.02:
-                idx -= 1
-            t0, p0 = self.drag_history[idx]
-            dt = max(1e-4, t1 - t0)
-            v_center = (p1 - p0) / dt
+            older = np.flatnonzero(t1 - hist[1:n, 0] >= 0.02)
+            idx = int(older[0]) + 1 if older.size else n - 1
+            t0 = hist[idx, 0]
+            dt = max(1e-4, float(t1 - t0))
             # Convert center-velocity to topleft-velocity (same)
-            # Scale down to keep throws reasonable
-            v = v_center * 0.85
+            # Scale down to keep throws reasonable; build the vector once, no temporaries
+            k = 0.85 / dt
+            v = pygame.Vector2(float(hist[0, 1] - hist[idx, 1]) * k, float(hist[0, 2] - hist[idx, 2]) * k)
             # Clamp speed
             max_speed = 1900.0
-            if v.length() > max_speed:
+            if v.length_squared() > max_speed * max_speed:
                 v.scale_to_length(max_speed)
             return v
 
         def _reset(self):
             self.rect.update(self.initial_rect)  # copies position/size
-            self.pos.update(self.rect.topleft)
-            self.vel.update(0, 0)
+            self._rect_topleft = self.rect.topleft
+            self.px, self.py = float(self.rect.x), float(self.rect.y)
+            self.vx = self.vy = 0.0
             self.paused = False
 
         # ----- Simulation -----
         def update(self, dt):
-            # Clamp dt to avoid tunneling on frame hiccups
-            dt = max(0.0, min(dt, 0.05))
-            if self.paused:
-                return
+            self._frame_time_s += dt
+            self._update_fn(dt)
 
+        def _select_update(self):
+            # Pick the per-frame handler once whenever state changes, instead of
+            # re-testing the drag/pause/sleep/gravity flags every frame
             if self.dragging:
-                # While dragging, physics halted; position already set in events
-                self.vel.update(0, 0)
-                return
+                self._update_fn = self._update_dragging
+            elif self.paused or self.asleep:
+                self._update_fn = self._update_idle
+            else:
+                self._update_fn = self._update_physics
+            self._g_eff = self.gravity if self.gravity_on else 0.0
+
+        def _update_idle(self, dt):
+            pass
 
-            # Gravity
-            if self.gravity_on:
-                self.vel.y += self.gravity * dt
+        def _update_dragging(self, dt):
+            # While dragging, physics halted; follow the frame's last pointer position
+            self._apply_pending_drag()
+            self.vx = self.vy = 0.0
 
-            # Air drag (exponential)
-            drag_factor = math.exp(-self.air_drag * dt)
-            self.vel *= drag_factor
+        def _update_physics(self, dt):
+            # Consume frame time in fixed substeps so hiccups neither tunnel nor slow the
+            # simulation down; the backlog is capped so a long stall can't spiral
+            self._accum += min(dt, 0.1)
+            while self._accum >= self._STEP:
+                self._integrate(self._STEP)
+                self._collide()
+                self._accum -= self._STEP
 
-            # Integrate
-            self.pos += self.vel * dt
+            # Nothing will move until input arrives
+            self.asleep = ((not self.gravity_on or self.rect.bottom >= self._sh)
+                           and abs(self.vx) < 1e-3 and abs(self.vy) < 1e-3)
+            if self.asleep:
+                self._update_fn = self._update_idle
+
+        def _integrate(self, dt):
+            # Gravity, exponential air drag, then position
+            drag = self._drag_factor
+            vx = self.vx * drag
+            vy = (self.vy + self._g_eff * dt) * drag
+            self.vx = vx
+            self.vy = vy
+            self.px += vx * dt
+            self.py += vy * dt
             self._update_rect_from_pos()
 
-            # Collisions with window edges
-            w, h = self.screen.get_size()
-            collided = False
-            impact_speed = 0.0
-
-            # Left
-            if self.rect.left < 0:
-                self.rect.left = 0
-                self.pos.x = self.rect.x
-                impact_speed = max(impact_speed, abs(self.vel.x))
-                self.vel.x = -self.vel.x * self.restitution
-                collided = True
-            # Right
-            if self.rect.right > w:
-                self.rect.right = w
-                self.pos.x = self.rect.x
-                impact_speed = max(impact_speed, abs(self.vel.x))
-                self.vel.x = -self.vel.x * self.restitution
-                collided = True
-            # Top
-            if self.rect.top < 0:
-                self.rect.top = 0
-                self.pos.y = self.rect.y
-                impact_speed = max(impact_speed, abs(self.vel.y))
-                self.vel.y = -self.vel.y * self.restitution
-                collided = True
-            # Bottom
-            if self.rect.bottom > h:
-                self.rect.bottom = h
-                self.pos.y = self.rect.y
-                impact_speed = max(impact_speed, abs(self.vel.y))
+        def _collide(self):
+            # Collisions with window edges: clamp the float position into the window in one
+            # go, a coordinate that moved means that axis hit an edge. Testing the float rather
+            # than the rounded rect keeps sub-pixel resting contact from building up a bounce
+            x = max(0.0, min(self.px, float(self._sw - self.rect.width)))
+            y = max(0.0, min(self.py, float(self._sh - self.rect.height)))
+            hit_x = x != self.px
+            hit_y = y != self.py
+            on_floor = y < self.py
+            impact_speed = max(abs(self.vx) * hit_x, abs(self.vy) * hit_y)
+            collided = hit_x or hit_y
+
+            if hit_x:
+                self.px = x
+                self.vx = -self.vx * self.restitution
+            if hit_y:
+                self.py = y
                 # Bounce only if falling; otherwise just clamp
-                if self.vel.y > 0:
-                    self.vel.y = -self.vel.y * self.restitution
-                # Floor friction and sleep when slow
-                if abs(self.vel.y) < self.sleep_threshold:
-                    self.vel.y = 0.0
-                self.vel.x *= self.floor_friction
-                collided = True
+                if not on_floor or self.vy > 0:
+                    self.vy = -self.vy * self.restitution
+                if on_floor:
+                    # Floor friction and sleep when slow
+                    if abs(self.vy) < self.sleep_threshold:
+                        self.vy = 0.0
+                    self.vx *= self._floor_friction_step
+            if collided:
+                self._update_rect_from_pos()
 
             if collided and impact_speed > 60:
                 self._play_bounce(impact_speed)
 
         # ----- Rendering -----
         def draw(self, screen):
-            # Background already drawn by the shell
+            # The shell blits the background on full redraws (dirty_rects is None then);
+            # otherwise only repaint when the sprite moved, restoring the background
+            # under its previous rect
+            if self._last_rect is not None and self.dirty_rects is not None:
+                if self.rect == self._last_rect:
+                    self.dirty_rects = []
+                    return
+                screen.blit(self.background_surf, self._last_rect, self._last_rect)
             screen.blit(self.surf, self.rect)
+            new_rect = self.rect.copy()
+            self.dirty_rects = [new_rect] if self._last_rect is None else [self._last_rect, new_rect]
+            self._last_rect = new_rect
 
         # Provide object-like interface explicitly
     return BouncyBallGame(screen, background_surf, context)
@@ -1,4 +1,7 @@
+import bisect
 import math
+import queue
+import threading
 import pygame
 
 try:
@@ -15,34 +18,60 @@ def create_game(screen, background_surf, context):
       draw(screen)           # draw your overlays/sprites; background is already drawn
     '''
     class BouncyBallGame:
-        def __init__(self, screen, context):
+        _RING_CAP = 64  # mouse sample ring size (power of two so the head wraps with a mask)
+
+        # Fixed attribute layout: no per-instance __dict__, cheaper attribute access
+        __slots__ = (
+            'surf', 'rect', 'background_surf', '_rect_topleft', '_sw', '_sh', 'px', 'py', 'vx', 'vy',
+            'gravity_enabled', 'g', 'linear_drag', '_damp_dt', '_damp', 'restitution', 'floor_stop_threshold',
+            'paused', 'asleep', 'dragging', 'drag_offset', '_pending_mouse', '_ring_t', '_ring_x', '_ring_y',
+            '_ring_head', '_ring_count', 'sample_window', 'max_throw_speed', 'throw_gain', 'initial_pos',
+            'initial_vel', 'initial_gravity', 'time', 'last_bounce_time', 'audio_ok', 'SAMPLE_RATE',
+            'make_sound_from_wave', '_audio_q', '_env', '_wave_f32', '_wave_i16', '_last_rect', 'dirty_rects',
+            '_update_fn', '_g_eff'
+        )
+
+        def __init__(self, screen, background_surf, context):
             assert "sprite" in context and isinstance(context["sprite"], dict), "sprite missing from context"
             spr = context["sprite"]
             self.surf = spr["surface"]
             self.rect = spr["rect"].copy()
-            # Physics state (use float position)
-            self.pos = pygame.Vector2(self.rect.topleft)
-            self.vel = pygame.Vector2(0.0, 0.0)
+            self.background_surf = background_surf
+            self._rect_topleft = self.rect.topleft  # integer topleft last written to rect
+            self._sw, self._sh = screen.get_size()  # cached; refreshed on VIDEORESIZE
+            # Physics state as plain floats (topleft position, velocity)
+            self.px, self.py = float(self.rect.x), float(self.rect.y)
+            self.vx, self.vy = 0.0, 0.0
 
             # Physics parameters
             self.gravity_enabled = True
             self.g = 1800.0  # px/s^2
             self.linear_drag = 0.15  # per-second damping
+            self._damp_dt = -1.0  # dt the cached damping factor was computed for
+            self._damp = 1.0
             self.restitution = 0.85  # bounce energy retention
             self.floor_stop_threshold = 20.0  # px/s to settle
 
             # Controls / state
             self.paused = False
+            self.asleep = False  # settled with no input; update() is a no-op until woken
             self.dragging = False
             self.drag_offset = pygame.Vector2(0, 0)
-            self.mouse_samples = []  # (time, (x, y)) for throw velocity
+            self._pending_mouse = None  # last drag MOUSEMOTION pos this frame, applied in update()
+            # Preallocated ring of (time, x, y) mouse samples for throw velocity.
+            # Plain lists rather than numpy: numpy is optional in this module.
+            self._ring_t = [0.0] * self._RING_CAP
+            self._ring_x = [0.0] * self._RING_CAP
+            self._ring_y = [0.0] * self._RING_CAP
+            self._ring_head = 0
+            self._ring_count = 0
             self.sample_window = 0.14
             self.max_throw_speed = 2400.0
             self.throw_gain = 1.0
 
             # Keep initial state for reset
-            self.initial_pos = self.pos.copy()
-            self.initial_vel = self.vel.copy()
+            self.initial_pos = (self.px, self.py)
+            self.initial_vel = (self.vx, self.vy)
             self.initial_gravity = self.gravity_enabled
 
             # Audio helpers (optional)
@@ -57,31 +86,61 @@ def create_game(screen, background_surf, context):
                 self.make_sound_from_wave = audio.get("make_sound_from_wave", None)
                 self.audio_ok = self.SAMPLE_RATE is not None and callable(self.make_sound_from_wave)
 
+            # Bounce sounds are synthesized and played on a worker so the main loop never stalls
+            self._audio_q = queue.Queue(maxsize=8)
+            self._env = None
+            self._wave_f32 = self._wave_i16 = None
+            if self.audio_ok:
+                # Fade ramp for the longest bounce (80 ms); each sound slices a prefix
+                max_n = int(self.SAMPLE_RATE * 0.08) + 1
+                self._env = np.linspace(1.0, 0.9, max_n, dtype=np.float32)
+                # Scratch buffers: synthesize straight to int16 PCM (worker-only, so reuse is safe)
+                self._wave_f32 = np.empty(max_n, dtype=np.float32)
+                self._wave_i16 = np.empty(max_n, dtype=np.int16)
+                threading.Thread(target=self._audio_worker, daemon=True).start()
+
+            # Dirty-rect rendering: the shell pushes only these rects to the display
+            self._last_rect = None
+            self.dirty_rects = []
+
+            # Per-frame update handler for the current state (see _select_update)
+            self._update_fn = None
+            self._g_eff = 0.0
+            self._select_update()
+
         # ---------- Controls ----------
         def handle_event(self, event):
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                self.asleep = False
                 if self.rect.collidepoint(event.pos):
                     self.dragging = True
-                    self.drag_offset = pygame.Vector2(event.pos) - pygame.Vector2(self.rect.topleft)
-                    self.mouse_samples.clear()
+                    self.drag_offset.update(event.pos[0] - self.rect.x, event.pos[1] - self.rect.y)
+                    self._clear_mouse_samples()
                     self._record_mouse_sample(event.pos)
                     # Zero velocity while dragging to avoid fighting with input
-                    self.vel.update(0.0, 0.0)
+                    self.vx = self.vy = 0.0
+                self._select_update()
 
             elif event.type == pygame.MOUSEMOTION and self.dragging:
-                new_top_left = pygame.Vector2(event.pos) - self.drag_offset
-                self.pos.update(new_top_left.x, new_top_left.y)
-                self.rect.topleft = (int(self.pos.x), int(self.pos.y))
-                self._record_mouse_sample(event.pos)
+                # Coalesced: only the frame's last motion is applied, once, in update()
+                self._pending_mouse = event.pos
 
             elif event.type == pygame.MOUSEBUTTONUP and event.button == 1 and self.dragging:
+                self._apply_pending_drag()
                 self.dragging = False
                 self._record_mouse_sample(event.pos)
                 throw_v = self._compute_throw_velocity()
                 if throw_v is not None:
-                    self.vel = throw_v
+                    self.vx, self.vy = throw_v
+                self._select_update()
+
+            elif event.type == pygame.VIDEORESIZE:
+                self._sw, self._sh = event.w, event.h
+                self.asleep = False
+                self._select_update()
 
             elif event.type == pygame.KEYDOWN:
+                self.asleep = False
                 if event.key == pygame.K_g:
                     self.gravity_enabled = not self.gravity_enabled
                 elif event.key == pygame.K_p:
@@ -93,133 +152,209 @@ def create_game(screen, background_surf, context):
                     if event.mod & pygame.KMOD_SHIFT:
                         step = 30
                     if event.key == pygame.K_LEFT:
-                        self.pos.x -= step
+                        self.px -= step
                     elif event.key == pygame.K_RIGHT:
-                        self.pos.x += step
+                        self.px += step
                     elif event.key == pygame.K_UP:
-                        self.pos.y -= step
+                        self.py -= step
                     elif event.key == pygame.K_DOWN:
-                        self.pos.y += step
-                    self.rect.topleft = (int(self.pos.x), int(self.pos.y))
+                        self.py += step
+                    self._sync_rect()
+                self._select_update()
 
         # ---------- Simulation ----------
         def update(self, dt):
             self.time += dt
-            if self.paused or self.dragging:
-                return
+            self._update_fn(dt)
 
-            # Apply gravity and drag, then integrate position (semi-implicit Euler)
-            if self.gravity_enabled:
-                self.vel.y += self.g * dt
+        def _select_update(self):
+            # Pick the per-frame handler once whenever state changes, instead of
+            # re-testing the drag/pause/sleep/gravity flags every frame
+            if self.dragging:
+                self._update_fn = self._update_dragging
+            elif self.paused or self.asleep:
+                self._update_fn = self._update_idle
+            else:
+                self._update_fn = self._update_physics
+            self._g_eff = self.g if self.gravity_enabled else 0.0
+
+        def _update_idle(self, dt):
+            pass
+
+        def _update_dragging(self, dt):
+            self._apply_pending_drag()
 
-            # Linear air drag as exponential damping
-            if self.linear_drag > 0:
-                damp = math.exp(-self.linear_drag * dt)
-                self.vel.x *= damp
-                self.vel.y *= damp
+        def _update_physics(self, dt):
+            # Linear air drag as exponential damping (frame dt is nearly constant, so exp() is cached)
+            if dt != self._damp_dt:
+                self._damp = math.exp(-self.linear_drag * dt) if self.linear_drag > 0 else 1.0
+                self._damp_dt = dt
 
-            self.pos += self.vel * dt
-            self.rect.topleft = (int(self.pos.x), int(self.pos.y))
+            # Apply gravity and drag, then integrate position (semi-implicit Euler)
+            damp = self._damp
+            vx = self.vx * damp
+            vy = (self.vy + self._g_eff * dt) * damp
+            self.vx = vx
+            self.vy = vy
+            self.px += vx * dt
+            self.py += vy * dt
+            self._sync_rect()
 
-            # Collisions with window edges
-            w, h = screen.get_size()
+            # Collisions with window edges, tested on the float position so sub-pixel
+            # resting contact doesn't build up speed before the truncated rect crosses the floor
+            w, h = self._sw, self._sh
+            rw, rh = self.rect.width, self.rect.height
             collided = False
-            speed_before = self.vel.length()
+            speed_before_sq = self.vx * self.vx + self.vy * self.vy
 
             # Left
-            if self.rect.left < 0:
-                self.rect.left = 0
-                self.pos.x = float(self.rect.left)
-                self.vel.x = -self.vel.x * self.restitution
+            if self.px < 0.0:
+                self.px = 0.0
+                self.vx = -self.vx * self.restitution
                 collided = True
             # Right
-            if self.rect.right > w:
-                self.rect.right = w
-                self.pos.x = float(self.rect.left)
-                self.vel.x = -self.vel.x * self.restitution
+            if self.px + rw > w:
+                self.px = float(w - rw)
+                self.vx = -self.vx * self.restitution
                 collided = True
             # Top
-            if self.rect.top < 0:
-                self.rect.top = 0
-                self.pos.y = float(self.rect.top)
-                self.vel.y = -self.vel.y * self.restitution
+            if self.py < 0.0:
+                self.py = 0.0
+                self.vy = -self.vy * self.restitution
                 collided = True
             # Bottom
-            if self.rect.bottom > h:
-                self.rect.bottom = h
-                self.pos.y = float(self.rect.top)
-                self.vel.y = -self.vel.y * self.restitution
+            if self.py + rh > h:
+                self.py = float(h - rh)
+                self.vy = -self.vy * self.restitution
                 # Simulate a little floor friction on bounce
-                self.vel.x *= 0.98
-                # If very slow, settle
-                if abs(self.vel.y) < self.floor_stop_threshold and self.gravity_enabled:
-                    self.vel.y = 0.0
+                self.vx *= 0.98
+                # If very slow, settle; a rebound gravity cancels within the frame is resting contact
+                if self.gravity_enabled and abs(self.vy) < max(self.floor_stop_threshold, self.g * dt):
+                    self.vy = 0.0
                 collided = True
 
+            if collided:
+                self._sync_rect()
+
             # Play bounce sound if strong enough and not too frequent
             if collided:
-                speed_after = self.vel.length()
-                impact_speed = max(speed_before, speed_after)
-                if impact_speed > 120.0:
-                    self._play_bounce(impact_speed)
+                # Compare squared speeds; the sqrt is only needed on the rare sound path
+                impact_sq = max(speed_before_sq, self.vx * self.vx + self.vy * self.vy)
+                if impact_sq > 120.0 * 120.0:
+                    self._play_bounce(math.sqrt(impact_sq))
+
+            # Nothing will move until input arrives
+            self.asleep = ((not self.gravity_enabled or self.rect.bottom >= h)
+                           and abs(self.vx) < 1e-3 and abs(self.vy) < 1e-3)
+            if self.asleep:
+                self._update_fn = self._update_idle
 
         # ---------- Rendering ----------
         def draw(self, screen):
+            # The shell blits the background on full redraws (dirty_rects is None then);
+            # otherwise only repaint when the sprite moved, restoring the background
+            # under its previous rect
+            if self._last_rect is not None and self.dirty_rects is not None:
+                if self.rect == self._last_rect:
+                    self.dirty_rects = []
+                    return
+                screen.blit(self.background_surf, self._last_rect, self._last_rect)
             screen.blit(self.surf, self.rect)
+            new_rect = self.rect.copy()
+            self.dirty_rects = [new_rect] if self._last_rect is None else [self._last_rect, new_rect]
+            self._last_rect = new_rect
 
         # ---------- Helpers ----------
+        def _apply_pending_drag(self):
+            if self._pending_mouse is None:
+                return
+            pos = self._pending_mouse
+            self._pending_mouse = None
+            self.px = pos[0] - self.drag_offset.x
+            self.py = pos[1] - self.drag_offset.y
+            self._sync_rect()
+            self._record_mouse_sample(pos)
+
+        def _sync_rect(self):
+            # Skip the Rect write while the integer position hasn't moved (slow/settling motion)
+            topleft = (int(self.px), int(self.py))
+            if topleft != self._rect_topleft:
+                self.rect.topleft = topleft
+                self._rect_topleft = topleft
+
         def _record_mouse_sample(self, pos):
-            now = self.time
-            self.mouse_samples.append((now, (float(pos[0]), float(pos[1]))))
-            # Drop old samples
-            cutoff = now - self.sample_window
-            while len(self.mouse_samples) > 2 and self.mouse_samples[0][0] < cutoff:
-                self.mouse_samples.pop(0)
+            # O(1) ring write; samples older than the ring capacity are overwritten
+            h = self._ring_head
+            self._ring_t[h] = self.time
+            self._ring_x[h] = float(pos[0])
+            self._ring_y[h] = float(pos[1])
+            self._ring_head = (h + 1) & (self._RING_CAP - 1)
+            self._ring_count = min(self._RING_CAP, self._ring_count + 1)
+
+        def _clear_mouse_samples(self):
+            self._ring_head = 0
+            self._ring_count = 0
 
         def _compute_throw_velocity(self):
-            if len(self.mouse_samples) < 2:
+            if self._ring_count < 2:
                 return None
-            t_end, p_end = self.mouse_samples[-1]
-            # Find earliest sample within window
-            idx = 0
-            for i in range(len(self.mouse_samples) - 2, -1, -1):
-                if t_end - self.mouse_samples[i][0] > self.sample_window:
-                    idx = i + 1
-                    break
-                idx = 0
-            t_start, p_start = self.mouse_samples[idx]
-            dt = max(1e-4, t_end - t_start)
-            vx = (p_end[0] - p_start[0]) / dt
-            vy = (p_end[1] - p_start[1]) / dt
-            v = pygame.Vector2(vx, vy) * self.throw_gain
+            mask = self._RING_CAP - 1
+            end = (self._ring_head - 1) & mask
+            t_end = self._ring_t[end]
+            # Ring times are sorted oldest->newest, so binary-search the earliest sample within window
+            oldest = (self._ring_head - self._ring_count) & mask
+            k = bisect.bisect_left(range(self._ring_count), t_end - self.sample_window,
+                                   key=lambda j: self._ring_t[(oldest + j) & mask])
+            start = (oldest + k) & mask
+            dt = max(1e-4, t_end - self._ring_t[start])
+            vx = (self._ring_x[end] - self._ring_x[start]) / dt
+            vy = (self._ring_y[end] - self._ring_y[start]) / dt
+            v = pygame.Vector2(vx * self.throw_gain, vy * self.throw_gain)
             # Clamp throw speed
-            speed = v.length()
-            if speed > self.max_throw_speed:
+            if v.length_squared() > self.max_throw_speed * self.max_throw_speed:
                 v.scale_to_length(self.max_throw_speed)
             return v
 
         def _reset(self):
-            self.pos = self.initial_pos.copy()
-            self.vel = self.initial_vel.copy()
+            self.px, self.py = self.initial_pos
+            self.vx, self.vy = self.initial_vel
             self.gravity_enabled = self.initial_gravity
-            self.rect.topleft = (int(self.pos.x), int(self.pos.y))
+            self._sync_rect()
 
         def _play_bounce(self, speed):
             if not self.audio_ok or self.time - self.last_bounce_time < 0.05:
                 return
             self.last_bounce_time = self.time
-            # Map speed to pitch and duration
-            s = max(0.0, min(speed, 1800.0)) / 1800.0
-            freq = 250.0 + 900.0 * s
-            dur = 0.03 + 0.05 * s
-            t = np.linspace(0, dur, int(self.SAMPLE_RATE * dur), endpoint=False)
-            # Simple sine with tiny fade
-            wave = 0.6 * np.sin(2 * np.pi * freq * t) * np.linspace(1.0, 0.9, t.size)
             try:
-                snd = self.make_sound_from_wave(wave, volume=0.8)
+                self._audio_q.put_nowait(speed)
+            except queue.Full:
+                pass  # drop bounces while the worker is backed up
+
+        def _audio_worker(self):
+            while True:
+                self._synth_bounce(self._audio_q.get())
+
+        def _synth_bounce(self, speed):
+            try:
+                # Map speed to pitch and duration
+                s = max(0.0, min(speed, 1800.0)) / 1800.0
+                freq = 250.0 + 900.0 * s
+                dur = 0.03 + 0.05 * s
+                t = np.linspace(0, dur, int(self.SAMPLE_RATE * dur), endpoint=False)
+                # Simple sine with tiny fade
+                n = t.size
+                wave = self._wave_f32[:n]
+                np.sin((2 * np.pi * freq) * t, out=wave)
+                # amplitude 0.6 at volume 0.8, scaled to int16 full range
+                np.multiply(wave, self._env[:n], out=wave)
+                wave *= 0.6 * 0.8 * 32767
+                np.rint(wave, out=wave)
+                pcm = self._wave_i16[:n]
+                pcm[:] = wave
+                snd = self.make_sound_from_wave(pcm, volume=1.0)
                 snd.play()
             except Exception:
-                # If audio fails, just ignore
+                # If audio fails, just ignore (and keep the worker thread alive)
                 pass
 
-    return BouncyBallGame(screen, context)
+    return BouncyBallGame(screen, background_surf, context)
@@ -1,5 +1,7 @@
 import sys
 import math
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import pygame
 import numpy as np
 
@@ -8,61 +10,99 @@ import numpy as np
 SAMPLE_RATE = 44100
 
 def init_audio():
+    # pygame.init() may already have opened a stereo mixer, which would reject the mono
+    # tone arrays; reopen it mono at our sample rate
     try:
-        pygame.mixer.pre_init(frequency=SAMPLE_RATE, size=-16, channels=1, buffer=512)
+        pygame.mixer.quit()
     except Exception:
         pass
-    pygame.mixer.init()
+    pygame.mixer.init(frequency=SAMPLE_RATE, size=-16, channels=1, buffer=512)
 
-_tone_cache = {}
+# Equal-tempered frequency of every MIDI note (C4 = 60), computed once
+_MIDI_FREQ = (261.6255653005986 * 2.0 ** ((np.arange(128) - 60) / 12.0)).tolist()
 
 def note_freq_from_c4(semitones_from_c4):
-    return 261.6255653005986 * (2 ** (semitones_from_c4 / 12.0))
+    return _MIDI_FREQ[60 + semitones_from_c4]
 
 NOTE_TO_ST = {
     'C': 0, 'C#': 1, 'D': 2, 'D#': 3, 'E': 4,
     'F': 5, 'F#': 6, 'G': 7, 'G#': 8, 'A': 9, 'A#': 10, 'B': 11
 }
 
+@functools.lru_cache(maxsize=64)
+def _time_base(duration):
+    # Sample times shared by every tone of this duration
+    return np.linspace(0, duration, int(SAMPLE_RATE * duration), endpoint=False, dtype=np.float32)
+
+@functools.lru_cache(maxsize=64)
+def _envelope(n_samples, attack, release):
+    # Fade-in/out shared (read-only) by every tone of the same length
+    env = np.ones(n_samples, dtype=np.float32)
+    env[:attack] = np.linspace(0, 1, attack, dtype=np.float32)
+    env[-release:] = np.linspace(1, 0, release, dtype=np.float32)
+    env.flags.writeable = False
+    return env
+
 def get_tone(freq, duration=0.5, volume=0.6):
-    key = (round(freq, 3), round(duration, 3), round(volume, 3))
-    if key in _tone_cache:
-        return _tone_cache[key]
-    n_samples = int(SAMPLE_RATE * duration)
-    t = np.linspace(0, duration, n_samples, endpoint=False)
+    # Quantize so near-identical requests share one cached Sound
+    return _synth_tone(round(freq, 3), round(duration, 3), round(volume, 3))
+
+@functools.lru_cache(maxsize=256)
+def _synth_tone(freq, duration, volume):
+    t = _time_base(duration)
+    n_samples = len(t)
     # Simple sine with quick fade-in/out to avoid clicks
-    wave = np.sin(2 * np.pi * freq * t)
-    attack = int(0.01 * n_samples) or 1
-    release = int(0.05 * n_samples) or 1
-    env = np.ones_like(wave)
-    env[:attack] = np.linspace(0, 1, attack)
-    env[-release:] = np.linspace(1, 0, release)
-    wave = wave * env * volume
+    wave = np.sin((2 * np.pi * freq) * t)
+    wave *= _envelope(n_samples, int(0.01 * n_samples) or 1, int(0.05 * n_samples) or 1)
+    wave *= volume
     audio = (wave * 32767).astype(np.int16)
-    snd = pygame.sndarray.make_sound(audio)
-    _tone_cache[key] = snd
-    return snd
+    return pygame.sndarray.make_sound(audio)
 
 # -------------- Image analysis (simple heuristics) --------------
 
 def surface_to_gray_and_mask(surface, black_thresh=80):
-    arr = pygame.surfarray.array3d(surface)  # shape (w, h, 3)
-    arr = arr.astype(np.float32)
-    # Convert to (h, w) grayscale
-    gray = (0.299 * arr[:, :, 0] + 0.587 * arr[:, :, 1] + 0.114 * arr[:, :, 2]).T
+    try:
+        arr = pygame.surfarray.pixels3d(surface)  # zero-copy (w, h, 3) view; locks the surface
+    except ValueError:
+        arr = pygame.surfarray.array3d(surface)   # 8/16-bit formats can't be viewed, copy instead
+    # Convert to (h, w) grayscale: Rec.601 weights scaled to 77/150/29 out of 256,
+    # accumulated in uint16 so no float temporaries are allocated
+    acc = np.multiply(arr[:, :, 0], 77, dtype=np.uint16)
+    acc += np.multiply(arr[:, :, 1], 150, dtype=np.uint16)
+    acc += np.multiply(arr[:, :, 2], 29, dtype=np.uint16)
+    acc >>= 8
+    del arr  # release the surface lock
+    gray = acc.astype(np.uint8).T
     mask_black = gray < black_thresh
     return gray, mask_black
 
-def max_run_length_1d(bool_row):
-    max_run = run = 0
-    for v in bool_row:
-        if v:
-            run += 1
-            if run > max_run:
-                max_run = run
-        else:
-            run = 0
-    return max_run
+def max_run_lengths(mask, axis=1):
+    # Longest run of True along each row (axis=1) or column (axis=0) of a 2D bool mask.
+    # Pad with False on both ends so every run has a +1 start and a -1 end in the diff;
+    # nonzero() walks row-major, so starts and ends pair up in order.
+    m = mask if axis == 1 else mask.T
+    n, length = m.shape
+    padded = np.zeros((n, length + 2), dtype=np.int8)
+    padded[:, 1:-1] = m
+    d = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(d == 1)
+    _, ends = np.nonzero(d == -1)
+    out = np.zeros(n, dtype=np.int64)
+    np.maximum.at(out, rows, ends - starts)
+    return out
+
+DETECT_MAX_SIDE = 800  # images longer than twice this are reduced before locating the keyboard
+
+def detection_step(w, h):
+    return max(1, max(w, h) // DETECT_MAX_SIDE)
+
+def downsample_mask(mask, step):
+    # Block "any" pooling: a dark pixel anywhere in a step x step block darkens it,
+    # so thin outline rows survive the reduction
+    if step == 1:
+        return mask
+    h, w = mask.shape[0] // step, mask.shape[1] // step
+    return mask[:h * step, :w * step].reshape(h, step, w, step).any(axis=(1, 3))
 
 def cluster_indices(indices, tol=3):
     if not indices:
@@ -82,11 +122,15 @@ def cluster_indices(indices, tol=3):
 
 def find_keyboard_rect(mask_black, w, h):
     # 1) Find strong horizontal lines by long black runs per row
-    row_scores = [max_run_length_1d(mask_black[y, :]) for y in range(h)]
-    candidates = [y for y, s in enumerate(row_scores) if s > 0.5 * w]
+    row_scores = max_run_lengths(mask_black, axis=1)
+    candidates = np.flatnonzero(row_scores > 0.5 * w).tolist()
     candidates = [y for y in candidates if int(h * 0.15) < y < int(h * 0.9)]
     line_rows = cluster_indices(candidates, tol=2)
 
+    # Dark pixels per row, prefix-summed once so each candidate band's density is a
+    # difference of two entries rather than another pass over that slice of the mask
+    row_cum = np.concatenate(([0], np.cumsum(np.count_nonzero(mask_black, axis=1))))
+
     best = None
     # consider all pairs and choose a plausible key-band
     for i in range(len(line_rows)):
@@ -94,8 +138,8 @@ def find_keyboard_rect(mask_black, w, h):
             y1, y2 = line_rows[i], line_rows[j]
             if y2 - y1 < int(h * 0.1) or y2 - y1 > int(h * 0.5):
                 continue
-            band = mask_black[y1:y2, :]
-            density = band.mean() if band.size else 0
+            band_size = (y2 - y1) * w
+            density = (row_cum[y2] - row_cum[y1]) / band_size if band_size else 0
             score = density * (y2 - y1)
             if best is None or score > best[0]:
                 best = (score, y1, y2)
@@ -111,22 +155,15 @@ def find_keyboard_rect(mask_black, w, h):
     # 2) Find left/right borders using vertical runs inside this band; avoid outer 10% of image width
     x_start = max(0, int(w * 0.08))
     x_end = min(w, int(w * 0.92))
-    col_scores = []
-    for x in range(x_start, x_end):
-        col = mask_black[y1:y2, x]
-        col_scores.append(max_run_length_1d(col))
+    col_scores = max_run_lengths(mask_black[y1:y2, x_start:x_end], axis=0)
 
     left = None
     right = None
     threshold = int(kb_h * 0.8)
-    for idx, s in enumerate(col_scores):
-        if s >= threshold:
-            left = x_start + idx
-            break
-    for idx in range(len(col_scores) - 1, -1, -1):
-        if col_scores[idx] >= threshold:
-            right = x_start + idx
-            break
+    strong = np.flatnonzero(col_scores >= threshold)
+    if strong.size:
+        left = x_start + int(strong[0])
+        right = x_start + int(strong[-1])
 
     if left is None or right is None or right - left < int(w * 0.2):
         # Fallback to central area
@@ -146,37 +183,20 @@ def detect_black_key_rects(mask_black, kb_rect):
     band_bottom = y1 + int(0.70 * kb_h)
     band_h = max(1, band_bottom - band_top)
 
-    cols_ratio = []
-    for x in range(x1, x2):
-        col = mask_black[band_top:band_bottom, x]
-        cols_ratio.append(col.mean())
+    # Dark-pixel ratio of every column in the band, in one reduction
+    arr = mask_black[band_top:band_bottom, x1:x2].mean(axis=0, dtype=np.float32)
 
     # Threshold by mean + deviation heuristic
-    arr = np.array(cols_ratio, dtype=np.float32)
     thr = max(0.35, float(arr.mean() + 0.5 * arr.std()))
     binary = arr > thr
 
-    # Find contiguous segments as potential black keys
-    rects = []
-    run_start = None
-    for i, v in enumerate(binary):
-        if v and run_start is None:
-            run_start = i
-        elif not v and run_start is not None:
-            run_end = i
-            width = run_end - run_start
-            if width >= int(kb_rect.width * 0.025):
-                bx1 = x1 + run_start
-                bw = width
-                rects.append(pygame.Rect(bx1, y1, bw, band_h))
-            run_start = None
-    if run_start is not None:
-        run_end = len(binary)
-        width = run_end - run_start
-        if width >= int(kb_rect.width * 0.025):
-            bx1 = x1 + run_start
-            bw = width
-            rects.append(pygame.Rect(bx1, y1, bw, band_h))
+    # Find contiguous segments as potential black keys: +1/-1 edges of the padded run mask
+    edges = np.diff(binary.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    widths = np.flatnonzero(edges == -1) - starts
+    keep = widths >= int(kb_rect.width * 0.025)
+    rects = [pygame.Rect(x1 + int(sx), y1, int(bw), band_h)
+             for sx, bw in zip(starts[keep], widths[keep])]
 
     # Merge very close rects (thin gaps)
     merged = []
@@ -208,10 +228,12 @@ class PianoKey:
         self.freq = note_freq_from_c4(NOTE_TO_ST[name])
         self.hover = False
         self.active = False
+        self.snd = None    # synthesized by build_piano
+        self.overlay_hover = None   # pre-rendered highlight surfaces, also set by build_piano
+        self.overlay_active = None
 
     def play(self):
-        snd = get_tone(self.freq, duration=0.45, volume=0.65 if self.color == 'white' else 0.55)
-        snd.play()
+        self.snd.play()
 
 def build_piano(kb_rect, black_rects_detected):
     keys_white = []
@@ -252,19 +274,79 @@ def build_piano(kb_rect, black_rects_detected):
     for r, nm in blacks:
         keys_black.append(PianoKey(r, nm, 'black'))
 
+    # Synthesize every key's Sound now so the first click doesn't stall on it
+    for k in keys_white + keys_black:
+        k.snd = get_tone(k.freq, duration=0.45, volume=0.65 if k.color == 'white' else 0.55)
+
+    # Highlights only depend on the key's size and color, so render them once
+    for k in keys_white:
+        k.overlay_hover = make_fill_overlay(k.rect.size, (255, 230, 80), 60)
+        k.overlay_active = make_fill_overlay(k.rect.size, (255, 230, 80), 110)
+    for k in keys_black:
+        k.overlay_hover = make_fill_overlay(k.rect.size, (120, 200, 255), 80)
+        k.overlay_active = make_fill_overlay(k.rect.size, (120, 200, 255), 140)
+
     return keys_white, keys_black
 
+class KeyArray:
+    # Key rects as a (4, n) int32 array of left/right/top/bottom edges for vectorized
+    # hit-tests. Blacks come first so they win where they overlap the whites.
+    def __init__(self, keys_white, keys_black):
+        self.keys = keys_black + keys_white
+        self.edges = np.array([[k.rect.left for k in self.keys], [k.rect.right for k in self.keys],
+                               [k.rect.top for k in self.keys], [k.rect.bottom for k in self.keys]],
+                              dtype=np.int32)
+        self.black_edges = self.edges[:, :len(keys_black)]
+        self.whites = keys_white
+        self.white_left = keys_white[0].rect.left
+        self.white_pitch = max(1e-6, (keys_white[-1].rect.right - self.white_left) / len(keys_white))
+
+    @staticmethod
+    def _hits(edges, pos):
+        mx, my = pos
+        left, right, top, bottom = edges
+        return (mx >= left) & (mx < right) & (my >= top) & (my < bottom)
+
+    def hits(self, pos):
+        return self._hits(self.edges, pos)
+
+    def key_at(self, pos):
+        hit = self._hits(self.black_edges, pos)
+        if hit.any():
+            return self.keys[int(np.argmax(hit))]
+        # White keys tile the keyboard evenly, so x alone picks the candidate; its
+        # neighbours are checked too since rounded key edges can be off by a pixel
+        i = int((pos[0] - self.white_left) // self.white_pitch)
+        for k in self.whites[max(0, i - 1):max(0, i + 2)]:
+            if k.rect.collidepoint(pos):
+                return k
+        return None
+
+def analyze_keyboard(surface, w, h):
+    # Image analysis + key construction; main() runs this on a worker thread
+    _, mask_black = surface_to_gray_and_mask(surface)
+    # Locate the keyboard on a reduced mask; black keys are then measured at full resolution
+    step = detection_step(w, h)
+    kb_rect = find_keyboard_rect(downsample_mask(mask_black, step), w // step, h // step)
+    kb_rect = pygame.Rect(kb_rect.x * step, kb_rect.y * step, kb_rect.w * step, kb_rect.h * step)
+    black_detected = detect_black_key_rects(mask_black, kb_rect)
+    white_keys, black_keys = build_piano(kb_rect, black_detected)
+    return kb_rect, white_keys, black_keys
+
 # -------------- Rendering helpers --------------
 
-def draw_hover_overlay(surface, rect, color, alpha):
-    overlay = pygame.Surface((rect.width, rect.height), pygame.SRCALPHA)
+def make_fill_overlay(size, color, alpha):
+    overlay = pygame.Surface(size, pygame.SRCALPHA)
     overlay.fill((*color, alpha))
-    surface.blit(overlay, rect.topleft)
+    return overlay
+
+def make_outline_overlay(size, color, width=2, alpha=180):
+    overlay = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.rect(overlay, (*color, alpha), pygame.Rect((0, 0), size), width)
+    return overlay
 
-def draw_outline(surface, rect, color, width=2, alpha=180):
-    overlay = pygame.Surface((rect.width, rect.height), pygame.SRCALPHA)
-    pygame.draw.rect(overlay, (*color, alpha), pygame.Rect(0, 0, rect.width, rect.height), width)
-    surface.blit(overlay, rect.topleft)
+def draw_key_overlay(surface, k):
+    surface.blit(k.overlay_hover if k.hover and not k.active else k.overlay_active, k.rect.topleft)
 
 # -------------- Main loop --------------
 
@@ -287,26 +369,37 @@ def main():
     screen = pygame.display.set_mode((w, h))
     pygame.display.set_caption("Interactive Piano (click keys, ESC to quit, S to screenshot)")
 
-    # Analyze image to locate keyboard area and keys
-    _, mask_black = surface_to_gray_and_mask(bg)
-    kb_rect = find_keyboard_rect(mask_black, w, h)
-    black_detected = detect_black_key_rects(mask_black, kb_rect)
-    white_keys, black_keys = build_piano(kb_rect, black_detected)
+    # Show the image right away, then analyze it off the main thread (NumPy releases the
+    # GIL). The worker holds a pixel lock on bg, so bg isn't blitted until it's done.
+    screen.blit(bg, (0, 0))
+    label = pygame.font.Font(None, 28).render("Detecting keyboard...", True, (255, 255, 255), (0, 0, 0))
+    screen.blit(label, (10, 10))
+    pygame.display.flip()
+    analysis = ThreadPoolExecutor(max_workers=1)
+    pending = analysis.submit(analyze_keyboard, bg, w, h)
+    analysis.shutdown(wait=False)
+    white_keys = black_keys = []
 
     clock = pygame.time.Clock()
     running = True
+    full_redraw = True   # first frame (and window exposes) repaint everything
+    last_mouse = None
+    lit = []             # (key, hover, active) of the highlighted keys last presented
 
     def key_at_pos(pos):
         # Prioritize black keys (they sit above whites visually)
-        for k in black_keys:
-            if k.rect.collidepoint(pos):
-                return k
-        for k in white_keys:
-            if k.rect.collidepoint(pos):
-                return k
-        return None
+        return key_array.key_at(pos)
 
     while running:
+        if pending is not None and pending.done():
+            kb_rect, white_keys, black_keys = pending.result()
+            pending = None
+            key_array = KeyArray(white_keys, black_keys)
+            outline_rect = kb_rect.inflate(6, 6)
+            outline = make_outline_overlay(outline_rect.size, (50, 150, 255), width=3, alpha=100)
+            full_redraw = True
+
+        buttons_changed = False
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
@@ -316,38 +409,64 @@ def main():
                 elif event.key == pygame.K_s:
                     pygame.image.save(screen, "screenshot.png")
                     print("Saved screenshot.png")
-            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and pending is None:
+                buttons_changed = True
                 k = key_at_pos(event.pos)
                 if k:
                     print(f"Played {k.name} ({int(round(k.freq))} Hz)")
                     k.active = True
                     k.play()
             elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                buttons_changed = True
                 for k in white_keys + black_keys:
                     k.active = False
+            elif event.type == pygame.VIDEOEXPOSE:
+                full_redraw = True
+
+        if pending is not None:
+            clock.tick(60)
+            continue
+
+        # Hover states: only re-test when the pointer moved or a button changed
+        mouse = pygame.mouse.get_pos()
+        if mouse != last_mouse or buttons_changed or full_redraw:
+            last_mouse = mouse
+            for k, hit in zip(key_array.keys, key_array.hits(mouse)):
+                k.hover = bool(hit)
+
+            # Repaint only the keys whose highlight appeared, changed or went away
+            now_lit = [(k, k.hover, k.active) for k in white_keys + black_keys if k.hover or k.active]
+            if full_redraw:
+                dirty = [screen.get_rect()]
+            elif now_lit != lit:
+                dirty = [k.rect for k, _, _ in lit + now_lit]
+            else:
+                dirty = []
+            lit = now_lit
+
+            if dirty:
+                screen.set_clip(dirty[0].unionall(dirty[1:]))
 
-        # Hover states
-        mx, my = pygame.mouse.get_pos()
-        for k in white_keys + black_keys:
-            k.hover = k.rect.collidepoint((mx, my))
+                # Draw
+                screen.blit(bg, (0, 0))
 
-        # Draw
-        screen.blit(bg, (0, 0))
+                # Subtle indication of interactive keyboard area
+                screen.blit(outline, outline_rect.topleft)
 
-        # Subtle indication of interactive keyboard area
-        draw_outline(screen, kb_rect.inflate(6, 6), (50, 150, 255), width=3, alpha=100)
+                # Draw overlays for hover/active
+                # Whites first
+                for k in white_keys:
+                    if k.hover or k.active:
+                        draw_key_overlay(screen, k)
+                # Blacks on top
+                for k in black_keys:
+                    if k.hover or k.active:
+                        draw_key_overlay(screen, k)
 
-        # Draw overlays for hover/active
-        # Whites first
-        for k in white_keys:
-            if k.hover or k.active:
-                draw_hover_overlay(screen, k.rect, (255, 230, 80), 60 if k.hover and not k.active else 110)
-        # Blacks on top
-        for k in black_keys:
-            if k.hover or k.active:
-                draw_hover_overlay(screen, k.rect, (120, 200, 255), 80 if k.hover and not k.active else 140)
+                screen.set_clip(None)
+                pygame.display.update(dirty)
+                full_redraw = False
 
-        pygame.display.flip()
         clock.tick(60)
 
     pygame.quit()
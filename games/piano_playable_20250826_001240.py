@@ -1,6 +1,7 @@
 import sys
 import os
 import math
+import functools
 import pygame
 import numpy as np
 
@@ -21,38 +22,44 @@ def make_sound_from_wave(wave_float, volume=0.6):
     # Returns a pygame.Sound shaped to the current mixer channels.
     
     import numpy as np, pygame
-    # int16 PCM
-    mono = (np.clip(wave_float * volume, -1.0, 1.0) * np.iinfo(np.int16).max).astype(np.int16)
+    # int16 PCM: one float temporary, clipped and scaled in place
+    pcm = wave_float * volume
+    np.clip(pcm, -1.0, 1.0, out=pcm)
+    pcm *= np.iinfo(np.int16).max
     mi = pygame.mixer.get_init()  # (freq, size, channels) or None
     channels = mi[2] if mi else 2
-    if channels == 1:
-        audio = mono
-    else:
-        audio = np.repeat(mono[:, None], channels, axis=1)  # (n, channels)
+    # Cast to int16 and fan out to every channel in a single copy
+    audio = np.empty(pcm.shape if channels == 1 else (len(pcm), channels), dtype=np.int16)
+    np.copyto(audio, pcm if channels == 1 else pcm[:, None], casting="unsafe")
     return pygame.sndarray.make_sound(audio)
 
-def midi_to_freq(midi):
-    return 440.0 * (2.0 ** ((midi - 69) / 12.0))
+# Equal-tempered frequency of every MIDI note (A4 = 69), computed once
+_MIDI_FREQ = (440.0 * 2.0 ** ((np.arange(128) - 69) / 12.0)).tolist()
 
-def synth_wave_for_midi(midi, dur=0.7):
-    freq = midi_to_freq(midi)
-    t = np.linspace(0, dur, int(SAMPLE_RATE * dur), endpoint=False)
+def midi_to_freq(midi):
+    return _MIDI_FREQ[midi]
+
+@functools.lru_cache(maxsize=8)
+def _envelope(n, attack, release):
+    # Ramps written in place over one buffer; shared (read-only) by every note of length n
+    env = np.ones(n, dtype=np.float32)
+    env[:attack] = np.linspace(0, 1, attack, endpoint=False, dtype=np.float32)
+    env[-release:] = np.linspace(1, 0, release, endpoint=False, dtype=np.float32)
+    env.flags.writeable = False
+    return env
+
+def synth_waves_for_midis(midis, dur=0.7):
+    # All notes in one (len(midis), N) block sharing a single time base and envelope
+    freqs = np.array([midi_to_freq(m) for m in midis], dtype=np.float32)
+    t = np.linspace(0, dur, int(SAMPLE_RATE * dur), endpoint=False, dtype=np.float32)
+    phase = (2*np.pi*freqs)[:, None] * t[None, :]
     # Simple additive: sine + weak second harmonic
-    wave = 0.85*np.sin(2*np.pi*freq*t) + 0.15*np.sin(2*np.pi*2*freq*t)
+    wave = 0.85*np.sin(phase) + 0.15*np.sin(2*phase)
     # ADSR envelope (short attack/release)
-    attack = max(1, int(0.01 * SAMPLE_RATE))
-    release = max(1, int(0.08 * SAMPLE_RATE))
-    sustain_len = max(1, len(t) - attack - release)
-    env = np.concatenate([
-        np.linspace(0, 1, attack, endpoint=False),
-        np.ones(sustain_len),
-        np.linspace(1, 0, release, endpoint=False)
-    ])
-    env = env[:len(t)]
-    wave *= env
-    # Normalize a bit
-    wave /= np.max(np.abs(wave) + 1e-6)
-    return wave.astype(np.float32)
+    wave *= _envelope(len(t), max(1, int(0.01 * SAMPLE_RATE)), max(1, int(0.08 * SAMPLE_RATE)))
+    # Normalize each note a bit
+    wave /= np.abs(wave).max(axis=1, keepdims=True) + 1e-6
+    return wave
 
 class Key:
     def __init__(self, rect, midi, name, is_black):
@@ -60,12 +67,35 @@ class Key:
         self.midi = midi
         self.name = name
         self.is_black = is_black
+        self.overlay = None        # pre-rendered surfaces, set by build_piano_keys_fixed
+        self.overlay_hover = None
+
+def box_filter(x, k):
+    # Same result as np.convolve(x, np.ones(k)/k, mode='same') in O(N): each window sum is a
+    # difference of the zero-padded cumulative sum (float64 so long sums stay exact)
+    cs = np.concatenate(([0.0], np.cumsum(np.pad(x, (k // 2, (k - 1) // 2)), dtype=np.float64)))
+    return (cs[k:] - cs[:-k]) / k
+
+DETECT_MAX_SIDE = 800  # images longer than twice this are sampled sparser for detection
 
 def detect_keyboard_rect(surface):
     # Try to detect the inner keyboard region automatically; fall back to a heuristic box
-    arr3 = pygame.surfarray.array3d(surface)  # (w, h, 3)
-    arr3 = np.transpose(arr3, (1, 0, 2))      # (h, w, 3)
-    gray = (0.2126*arr3[:,:,0] + 0.7152*arr3[:,:,1] + 0.0722*arr3[:,:,2]).astype(np.float32)
+    W, H = surface.get_size()
+    # The density profiles below are averages, so every step-th pixel is enough on big images
+    step = max(1, max(W, H) // DETECT_MAX_SIDE)
+    try:
+        arr3 = pygame.surfarray.pixels3d(surface)  # zero-copy (w, h, 3) view; locks the surface
+    except ValueError:
+        arr3 = pygame.surfarray.array3d(surface)   # 8/16-bit formats can't be viewed, copy instead
+    arr3 = arr3[::step, ::step]
+    # Rec.709 luma as integer weights 54/183/19 out of 256, accumulated in uint16
+    gray = np.multiply(arr3[:,:,0], 54, dtype=np.uint16)
+    gray += np.multiply(arr3[:,:,1], 183, dtype=np.uint16)
+    gray += np.multiply(arr3[:,:,2], 19, dtype=np.uint16)
+    gray >>= 8
+    del arr3  # release the surface lock
+    # Transpose only the 1-byte luma to (h, w), not the 3-byte RGB cube
+    gray = np.ascontiguousarray(gray.T, dtype=np.uint8)
 
     h, w = gray.shape
     # Threshold for dark pixels (adaptive)
@@ -75,8 +105,7 @@ def detect_keyboard_rect(surface):
     # Horizontal density
     row_sum = dark.sum(axis=1)
     k = max(5, h // 50)
-    kernel = np.ones(k, dtype=np.float32) / k
-    row_sm = np.convolve(row_sum, kernel, mode='same')
+    row_sm = box_filter(row_sum, k)
     r_peak = int(np.argmax(row_sm))
     r_threshold = row_sm.max() * 0.5
     top = r_peak
@@ -91,8 +120,7 @@ def detect_keyboard_rect(surface):
     # Vertical density within band
     col_sum = dark[top:bottom+1, :].sum(axis=0)
     k2 = max(5, w // 50)
-    kernel2 = np.ones(k2, dtype=np.float32) / k2
-    col_sm = np.convolve(col_sum, kernel2, mode='same')
+    col_sm = box_filter(col_sum, k2)
     c_threshold = col_sm.max() * 0.2
     cols = np.where(col_sm > c_threshold)[0]
     if len(cols) > 0:
@@ -101,6 +129,11 @@ def detect_keyboard_rect(surface):
     else:
         left, right = int(0.1*w), int(0.9*w)
 
+    # Back to full-resolution pixels
+    if step > 1:
+        top, bottom, left, right = top * step, bottom * step, left * step, right * step
+        h, w = H, W
+
     # Shrink margins to avoid outlines
     mx = int(0.03 * w)
     my = int(0.02 * h)
@@ -119,43 +152,7 @@ def detect_keyboard_rect(surface):
         rect = pygame.Rect(kb_x, kb_y, kb_w, kb_h)
     return rect
 
-def build_piano_keys(krect):
-    # 7 white keys: C D E F G A B; 5 black keys: C# D# F# G# A#
-    names_white = ['C4','D4','E4','F4','G4','A4','B4']
-    midis_white = [60,62,64,65,67,69,71]
-    names_black = ['C#4','D#4','F#4','G#4','A#4']
-    midis_black = [61,63,66,68,70]
-    keys = []
-
-    white_w = krect.w / 7.0
-    # Build white keys
-    for i, (n, m) in enumerate(zip(names_white, midis_white)):
-        x0 = int(round(krect.left + i * white_w))
-        x1 = int(round(krect.left + (i+1) * white_w))
-        rect = pygame.Rect(x0, krect.top, max(1, x1 - x0), krect.h)
-        keys.append(Key(rect, m, n, is_black=False))
-
-    # Build black keys (positions between specific white keys)
-    black_positions = [0, 1, 3, 4, 5]  # indices before which black keys sit (between i and i+1)
-    black_w = int(white_w * 0.6)
-    black_h = int(krect.h * 0.6)
-    for idx, (n, m) in enumerate(zip(black_positions, midis_black)):
-        center_x = krect.left + (idx if idx < 2 else idx+1)  # this mapping is wrong; fix next
-    # Proper mapping: use the positions list directly
-    black_rects = []
-    for pos_idx, (n, m) in zip(black_positions, zip(names_black, midis_black)):
-        n_name, m_midi = n  # unpack zipped pair
-        # Center at boundary between white key pos_idx and pos_idx+1
-        cx = krect.left + (pos_idx + 1) * white_w
-        x = int(round(cx - black_w / 2))
-        rect = pygame.Rect(x, krect.top, black_w, black_h)
-        black_rects.append(Key(rect, m_midi, n_name, is_black=True))
-
-    # Return with black keys last for drawing overlay logic control; but we will check blacks first for hit tests
-    return keys, black_rects
-
 def build_piano_keys_fixed(krect):
-    # Simpler, correct construction without the mistake above
     names_white = ['C4','D4','E4','F4','G4','A4','B4']
     midis_white = [60,62,64,65,67,69,71]
     names_black = ['C#4','D#4','F#4','G#4','A#4']
@@ -179,45 +176,74 @@ def build_piano_keys_fixed(krect):
         x = int(round(cx - black_w / 2))
         rect = pygame.Rect(x, krect.top, black_w, black_h)
         keys_black.append(Key(rect, m, n, is_black=True))
+
+    # Overlays only depend on each key's size, so render them once here rather than per frame
+    for k in keys_white:
+        k.overlay = make_key_overlay(k.rect.size, (0, 0, 0, 60), width=2, border_radius=2)
+        k.overlay_hover = make_key_overlay(k.rect.size, (80, 160, 255, 90))
+    for k in keys_black:
+        k.overlay = make_key_overlay(k.rect.size, (0, 0, 0, 90), border_radius=3)
+        k.overlay_hover = make_key_overlay(k.rect.size, (255, 220, 80, 110))
     return keys_white, keys_black
 
+class KeyArray:
+    # Key rects as a (4, n) int32 array of left/right/top/bottom edges for vectorized
+    # hit-tests. Blacks come first so they win where they overlap the whites.
+    def __init__(self, keys_white, keys_black):
+        self.keys = keys_black + keys_white
+        self.edges = np.array([[k.rect.left for k in self.keys], [k.rect.right for k in self.keys],
+                               [k.rect.top for k in self.keys], [k.rect.bottom for k in self.keys]],
+                              dtype=np.int32)
+        self.black_edges = self.edges[:, :len(keys_black)]
+        self.whites = keys_white
+        self.white_left = keys_white[0].rect.left
+        self.white_pitch = max(1e-6, (keys_white[-1].rect.right - self.white_left) / len(keys_white))
+
+    @staticmethod
+    def _hits(edges, pos):
+        mx, my = pos
+        left, right, top, bottom = edges
+        return (mx >= left) & (mx < right) & (my >= top) & (my < bottom)
+
+    def hits(self, pos):
+        return self._hits(self.edges, pos)
+
+    def key_at(self, pos):
+        hit = self._hits(self.black_edges, pos)
+        if hit.any():
+            return self.keys[int(np.argmax(hit))]
+        # White keys tile the keyboard evenly, so x alone picks the candidate; its
+        # neighbours are checked too since rounded key edges can be off by a pixel
+        i = int((pos[0] - self.white_left) // self.white_pitch)
+        for k in self.whites[max(0, i - 1):max(0, i + 2)]:
+            if k.rect.collidepoint(pos):
+                return k
+        return None
+
 def prepare_sounds(midis):
-    sounds = {}
-    for m in midis:
-        wave = synth_wave_for_midi(m, dur=0.8)
-        sounds[m] = make_sound_from_wave(wave, volume=0.7)
-    return sounds
+    waves = synth_waves_for_midis(midis, dur=0.8)
+    return {m: make_sound_from_wave(wave, volume=0.7) for m, wave in zip(midis, waves)}
+
+def make_key_overlay(size, color, width=0, border_radius=2):
+    surf = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.rect(surf, color, pygame.Rect((0, 0), size), width=width, border_radius=border_radius)
+    return surf
 
 def draw_overlays(screen, keys_white, keys_black, hover_key):
     # semi-transparent overlays
     # Draw white key outlines lightly, black keys filled darker area to emphasize zones
     for k in keys_white:
-        outline_color = (0, 0, 0, 60)
-        surf = pygame.Surface((k.rect.w, k.rect.h), pygame.SRCALPHA)
-        pygame.draw.rect(surf, outline_color, pygame.Rect(0,0,k.rect.w, k.rect.h), width=2, border_radius=2)
-        screen.blit(surf, (k.rect.x, k.rect.y))
+        screen.blit(k.overlay, k.rect.topleft)
 
     for k in keys_black:
-        fill_color = (0, 0, 0, 90)
-        surf = pygame.Surface((k.rect.w, k.rect.h), pygame.SRCALPHA)
-        pygame.draw.rect(surf, fill_color, pygame.Rect(0,0,k.rect.w, k.rect.h), width=0, border_radius=3)
-        screen.blit(surf, (k.rect.x, k.rect.y))
+        screen.blit(k.overlay, k.rect.topleft)
 
     if hover_key is not None:
-        c = (80, 160, 255, 90) if not hover_key.is_black else (255, 220, 80, 110)
-        surf = pygame.Surface((hover_key.rect.w, hover_key.rect.h), pygame.SRCALPHA)
-        pygame.draw.rect(surf, c, pygame.Rect(0,0,hover_key.rect.w, hover_key.rect.h), border_radius=2)
-        screen.blit(surf, (hover_key.rect.x, hover_key.rect.y))
+        screen.blit(hover_key.overlay_hover, hover_key.rect.topleft)
 
-def key_at_pos(keys_white, keys_black, pos):
+def key_at_pos(key_array, pos):
     # Black keys take precedence if overlapping
-    for k in keys_black:
-        if k.rect.collidepoint(pos):
-            return k
-    for k in keys_white:
-        if k.rect.collidepoint(pos):
-            return k
-    return None
+    return key_array.key_at(pos)
 
 def main():
     if len(sys.argv) < 2:
@@ -240,6 +266,7 @@ def main():
     # Detect keyboard rect and create key regions
     kb_rect = detect_keyboard_rect(background)
     keys_white, keys_black = build_piano_keys_fixed(kb_rect)
+    key_array = KeyArray(keys_white, keys_black)
 
     # Prepare sounds
     all_midis = [k.midi for k in keys_white + keys_black]
@@ -248,6 +275,8 @@ def main():
     clock = pygame.time.Clock()
     running = True
     hover_key = None
+    full_redraw = True   # first frame (and window exposes) repaint everything
+    last_mouse = None
 
     while running:
         for event in pygame.event.get():
@@ -260,23 +289,44 @@ def main():
                     # Optional screenshot
                     pygame.image.save(screen, "screenshot.png")
             elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                k = key_at_pos(keys_white, keys_black, event.pos)
+                k = key_at_pos(key_array, event.pos)
                 if k is not None:
                     snd = sound_map.get(k.midi)
                     if snd:
                         snd.play()
                     print(k.name)
+            elif event.type == pygame.VIDEOEXPOSE:
+                full_redraw = True
+
+        # Only re-test hover when the pointer moved; clicks don't change what's drawn
+        mouse = pygame.mouse.get_pos()
+        if mouse != last_mouse or full_redraw:
+            last_mouse = mouse
+            new_hover = key_at_pos(key_array, mouse)
+
+            # Repaint only the keys losing and gaining the hover highlight
+            if full_redraw:
+                dirty = [screen.get_rect()]
+            elif new_hover is not hover_key:
+                dirty = [k.rect for k in (hover_key, new_hover) if k is not None]
+            else:
+                dirty = []
+            hover_key = new_hover
+
+            if dirty:
+                screen.set_clip(dirty[0].unionall(dirty[1:]))
+
+                # Draw
+                screen.blit(background, (0, 0))
+                draw_overlays(screen, keys_white, keys_black, hover_key)
+
+                # Optional label near detected area
+                # pygame.draw.rect(screen, (0,255,0), kb_rect, 1)
+
+                screen.set_clip(None)
+                pygame.display.update(dirty)
+                full_redraw = False
 
-        hover_key = key_at_pos(keys_white, keys_black, pygame.mouse.get_pos())
-
-        # Draw
-        screen.blit(background, (0, 0))
-        draw_overlays(screen, keys_white, keys_black, hover_key)
-
-        # Optional label near detected area
-        # pygame.draw.rect(screen, (0,255,0), kb_rect, 1)
-
-        pygame.display.flip()
         clock.tick(60)
 
     pygame.quit()
@@ -20,12 +20,30 @@ Notes:
 from __future__ import annotations
 import os
 from pathlib import Path
-import tempfile
-from typing import Tuple, Dict, Optional
+from typing import Tuple, Dict, Optional, Union
 
 import cv2
 import numpy as np
 
+# Contours are searched on a pyrDown copy no larger than this (px, longest side)
+_WORK_MAX_SIDE = 512
+# 3x3 structuring element used to thicken Canny edges
+_K3 = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+# Sprite/component PNGs are read straight back by the game shell: favour encode speed over size
+_PNG_FAST = [cv2.IMWRITE_PNG_COMPRESSION, 1]
+
+
+def _read_bgr(image: Union[str, np.ndarray]) -> np.ndarray:
+    """Return a BGR image: arrays are used as-is, paths are decoded with cv2.imread."""
+    if isinstance(image, np.ndarray):
+        return image
+    if not os.path.isfile(image):
+        raise FileNotFoundError(image)
+    bgr = cv2.imread(image, cv2.IMREAD_COLOR)
+    if bgr is None:
+        raise RuntimeError(f"Failed to read image: {image}")
+    return bgr
+
 
 def _auto_canny(gray: np.ndarray, sigma: float = 0.33) -> np.ndarray:
     """Auto-select Canny thresholds based on image median."""
@@ -35,76 +53,103 @@ def _auto_canny(gray: np.ndarray, sigma: float = 0.33) -> np.ndarray:
     return cv2.Canny(gray, lower, upper)
 
 
-def _touches_border(rect: Tuple[int, int, int, int], w: int, h: int, pad: int = 2) -> bool:
-    x, y, rw, rh = rect
-    return x <= pad or y <= pad or (x + rw) >= (w - pad) or (y + rh) >= (h - pad)
-
-
-def _best_external_contour(contours, w: int, h: int):
+def _best_external_contour(contours, w: int, h: int, pad: int = 2):
     """
     Score contours by area, penalize those touching borders (often entire frame/box).
     Return the best contour; None if empty list.
     """
+    if not contours:
+        return None
+
+    # Bounding boxes of all contours at once: per-contour min/max over the concatenated points
+    lengths = np.fromiter((len(c) for c in contours), dtype=np.intp, count=len(contours))
+    pts = np.concatenate(contours).reshape(-1, 2)
+    starts = np.concatenate(([0], np.cumsum(lengths[:-1])))
+    lo = np.minimum.reduceat(pts, starts)
+    hi = np.maximum.reduceat(pts, starts) + 1
+    touches = (lo <= pad).any(axis=1) | (hi[:, 0] >= w - pad) | (hi[:, 1] >= h - pad)
+    weights = np.where(touches, 0.6, 1.0)  # penalize border-touching shapes
+
+    # A contour's area never exceeds its bounding box, so visit contours by descending
+    # box-area bound and stop computing areas once no remaining one can beat the best
+    bounds = (hi - lo).prod(axis=1).astype(np.float64) * weights
     best = None
-    best_score = -1.0
-    for c in contours:
-        area = float(cv2.contourArea(c))
-        if area <= 0:
-            continue
-        x, y, rw, rh = cv2.boundingRect(c)
-        score = area
-        if _touches_border((x, y, rw, rh), w, h):
-            score *= 0.6  # penalize border-touching shapes
+    best_score = 0.0
+    for i in np.argsort(-bounds, kind="stable"):
+        if bounds[i] <= best_score:
+            break
+        score = cv2.contourArea(contours[i]) * weights[i]
         if score > best_score:
             best_score = score
-            best = c
+            best = contours[i]
     return best
 
 
 def extract_main_object_to_png(
-    bg_path: str,
+    bg_path: Union[str, np.ndarray],
     out_path: Optional[str] = None,
     min_area_ratio: float = 0.0025,  # ignore tiny specks < 0.25% of image
     debug_out: Optional[str] = None,
+    use_canny: bool = False,
 ) -> Tuple[str, Dict[str, int]]:
     """
     Detect the main object and save as a cropped RGBA sprite with transparency.
 
-    :param bg_path: Input PNG/JPG path (your canvas snapshot).
-    :param out_path: Optional output sprite PNG path. Defaults to "<bg_stem>_sprite.png".
+    :param bg_path: Input PNG/JPG path (your canvas snapshot), or an already decoded BGR array.
+    :param out_path: Optional output sprite PNG path. Defaults to "<bg_stem>_sprite.png";
+        required when bg_path is an array.
     :param min_area_ratio: Minimum contour area relative to image area to accept.
     :param debug_out: Optional path to write a debug visualization (PNG).
+    :param use_canny: Find the object from Canny edges instead of an Otsu threshold
+        (also used automatically when the threshold mask looks implausible).
     :return: (sprite_path, {"x": int, "y": int, "w": int, "h": int})
     """
-    if not os.path.isfile(bg_path):
-        raise FileNotFoundError(bg_path)
+    from_array = isinstance(bg_path, np.ndarray)
+    if from_array and out_path is None:
+        raise ValueError("out_path is required when bg_path is an image array")
 
-    print(f"[object-extract] extracting main object from {bg_path}")
+    print(f"[object-extract] extracting main object from {'<array>' if from_array else bg_path}")
 
-    bgr = cv2.imread(bg_path, cv2.IMREAD_COLOR)
-    if bgr is None:
-        raise RuntimeError(f"Failed to read image: {bg_path}")
+    bgr = _read_bgr(bg_path)
     H, W = bgr.shape[:2]
     print(f"[object-extract] canvas size: {W}x{H}")
 
-    # 1) Grayscale + mild blur to stabilize edges
-    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-    gray = cv2.GaussianBlur(gray, (5, 5), 0)
-
-    # 2) Edge detection + dilation to thicken line art
-    edges = _auto_canny(gray, sigma=0.33)
-    edges = cv2.dilate(edges, np.ones((3, 3), np.uint8), iterations=1)
+    # 1) Grayscale of a working copy: large canvases are halved until they fit
+    #    _WORK_MAX_SIDE, and the chosen contour is scaled back up so the sprite and its
+    #    alpha are still cut from the full-resolution image
+    work, scale = bgr, 1
+    while max(work.shape[:2]) > _WORK_MAX_SIDE:
+        work = cv2.pyrDown(work)
+        scale *= 2
+    h, w = work.shape[:2]
+    gray = cv2.cvtColor(work, cv2.COLOR_BGR2GRAY)
+
+    # 2) Foreground mask: dark strokes on a light canvas separate cleanly with one Otsu
+    #    threshold. If that marks nothing or most of the image, it isn't line art on a
+    #    light background; fall back to blurred Canny edges thickened by a dilation.
+    fg = None
+    if not use_canny:
+        _, fg = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+        fg_ratio = cv2.countNonZero(fg) / float(w * h)
+        if not 0.0 < fg_ratio < 0.5:
+            print(f"[object-extract] threshold mask implausible (fg={fg_ratio:.2f}); using edges")
+            fg = None
+    if fg is None:
+        edges = _auto_canny(cv2.GaussianBlur(gray, (5, 5), 0), sigma=0.33)
+        fg = cv2.dilate(edges, _K3, iterations=1)
 
     # 3) Find external contours
-    cnts_info = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    cnts_info = cv2.findContours(fg, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     contours = cnts_info[0] if len(cnts_info) == 2 else cnts_info[1]
 
     if not contours:
         raise RuntimeError("No contours found")
 
-    best = _best_external_contour(contours, W, H)
+    best = _best_external_contour(contours, w, h)
     if best is None:
         raise RuntimeError("No suitable contour found")
+    if scale > 1:
+        best = best * scale
 
     x, y, rw, rh = cv2.boundingRect(best)
     area = rw * rh
@@ -112,18 +157,16 @@ def extract_main_object_to_png(
     if area < min_area_ratio * (W * H):
         raise RuntimeError("Detected object is too small; likely noise")
 
-    # 4) Build filled mask for the best contour; close small holes
-    mask = np.zeros((H, W), dtype=np.uint8)
-    cv2.drawContours(mask, [best], -1, 255, thickness=cv2.FILLED)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((3, 3), np.uint8), iterations=1)
-
-    # 5) Compose RGBA and crop
-    rgba = cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA)
-    rgba[:, :, 3] = mask  # alpha channel
+    # 4) Build filled mask for the best contour, only over its bounding box (an external
+    #    contour filled solid has no holes left to close)
+    mask = np.zeros((rh, rw), dtype=np.uint8)
+    cv2.drawContours(mask, [best], -1, 255, thickness=cv2.FILLED, offset=(-x, -y))
 
-    crop = rgba[y:y + rh, x:x + rw].copy()
-    if crop.size == 0 or crop.shape[0] == 0 or crop.shape[1] == 0:
+    # 5) Compose RGBA straight from the cropped colour channels plus the mask as alpha
+    crop_bgr = bgr[y:y + rh, x:x + rw]
+    if crop_bgr.size == 0 or crop_bgr.shape[0] == 0 or crop_bgr.shape[1] == 0:
         raise RuntimeError("Empty crop after contour extraction")
+    crop = np.dstack((crop_bgr, mask))
 
     # 6) Write sprite
     if out_path is None:
@@ -132,7 +175,7 @@ def extract_main_object_to_png(
     out_dir = Path(out_path).parent
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    ok = cv2.imwrite(out_path, crop)
+    ok = cv2.imwrite(out_path, crop, _PNG_FAST)
     if not ok:
         raise RuntimeError(f"Failed to write sprite PNG: {out_path}")
 
@@ -141,8 +184,10 @@ def extract_main_object_to_png(
         dbg = bgr.copy()
         cv2.rectangle(dbg, (x, y), (x + rw, y + rh), (0, 255, 0), 2)
         cv2.drawContours(dbg, [best], -1, (255, 0, 0), 2)
-        alpha_color = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR)
-        alpha_color = (0.3 * alpha_color + 0.7 * dbg).astype(np.uint8)
+        full_mask = np.zeros((H, W), dtype=np.uint8)
+        full_mask[y:y + rh, x:x + rw] = mask
+        alpha_color = cv2.cvtColor(full_mask, cv2.COLOR_GRAY2BGR)
+        alpha_color = cv2.addWeighted(alpha_color, 0.3, dbg, 0.7, 0.0)
         cv2.imwrite(debug_out, alpha_color)
 
     meta = {"x": int(x), "y": int(y), "w": int(rw), "h": int(rh)}
@@ -152,7 +197,7 @@ def extract_main_object_to_png(
 
 
 def extract_component_from_bbox(
-    bg_path: str,
+    bg_path: Union[str, np.ndarray],
     bbox: Dict[str, int],
     out_path: str,
     min_area_ratio: float = 0.0025,
@@ -161,11 +206,11 @@ def extract_component_from_bbox(
     Crop a rectangular region and attempt to extract the foreground object within it.
 
     Falls back to a plain rectangular crop if contour extraction fails.
+    bg_path may be a path or an already decoded BGR array; the crop is handed to
+    extract_main_object_to_png in memory.
     Returns the sprite path and absolute coordinates (x, y, w, h) relative to the
     original background image.
     """
-    if not os.path.isfile(bg_path):
-        raise FileNotFoundError(bg_path)
     if not bbox:
         raise ValueError("bbox is required")
 
@@ -176,12 +221,9 @@ def extract_component_from_bbox(
     if w <= 0 or h <= 0:
         raise ValueError(f"Invalid bbox dimensions: {bbox}")
 
-    print(f"[component-extract] bbox={bbox} bg={bg_path}")
-
-    bgr = cv2.imread(bg_path, cv2.IMREAD_COLOR)
-    if bgr is None:
-        raise RuntimeError(f"Failed to read image: {bg_path}")
+    print(f"[component-extract] bbox={bbox} bg={'<array>' if isinstance(bg_path, np.ndarray) else bg_path}")
 
+    bgr = _read_bgr(bg_path)
     H, W = bgr.shape[:2]
     x0 = max(0, min(W - 1, x))
     y0 = max(0, min(H - 1, y))
@@ -191,48 +233,39 @@ def extract_component_from_bbox(
         raise ValueError(f"BBox outside image bounds: {bbox}")
 
     crop = bgr[y0:y1, x0:x1]
-    fd, temp_path = tempfile.mkstemp(prefix="component_", suffix=".png")
-    os.close(fd)
+    candidate_path = out_path
+    out_dir = Path(candidate_path).parent
+    out_dir.mkdir(parents=True, exist_ok=True)
+
     try:
-        cv2.imwrite(temp_path, crop)
-        candidate_path = out_path
-        out_dir = Path(candidate_path).parent
-        out_dir.mkdir(parents=True, exist_ok=True)
-
-        try:
-            sprite_path, meta = extract_main_object_to_png(
-                temp_path,
-                out_path=candidate_path,
-                min_area_ratio=min_area_ratio,
-            )
-            meta = {
-                "x": x0 + int(meta["x"]),
-                "y": y0 + int(meta["y"]),
-                "w": int(meta["w"]),
-                "h": int(meta["h"]),
-            }
-            print(f"[component-extract] contour success path={sprite_path} meta={meta}")
-            return sprite_path, meta
-        except RuntimeError:
-            print("[component-extract] contour failed, using raw crop")
-            rgba = cv2.cvtColor(crop, cv2.COLOR_BGR2BGRA)
-            rgba[:, :, 3] = 255
-            ok = cv2.imwrite(candidate_path, rgba)
-            if not ok:
-                raise RuntimeError(f"Failed to write component PNG: {candidate_path}")
-            meta = {
-                "x": x0,
-                "y": y0,
-                "w": x1 - x0,
-                "h": y1 - y0,
-            }
-            print(f"[component-extract] fallback path={candidate_path} meta={meta}")
-            return candidate_path, meta
-    finally:
-        try:
-            os.remove(temp_path)
-        except OSError:
-            pass
+        sprite_path, meta = extract_main_object_to_png(
+            crop,
+            out_path=candidate_path,
+            min_area_ratio=min_area_ratio,
+        )
+        meta = {
+            "x": x0 + int(meta["x"]),
+            "y": y0 + int(meta["y"]),
+            "w": int(meta["w"]),
+            "h": int(meta["h"]),
+        }
+        print(f"[component-extract] contour success path={sprite_path} meta={meta}")
+        return sprite_path, meta
+    except RuntimeError:
+        print("[component-extract] contour failed, using raw crop")
+        rgba = cv2.cvtColor(crop, cv2.COLOR_BGR2BGRA)
+        rgba[:, :, 3] = 255
+        ok = cv2.imwrite(candidate_path, rgba, _PNG_FAST)
+        if not ok:
+            raise RuntimeError(f"Failed to write component PNG: {candidate_path}")
+        meta = {
+            "x": x0,
+            "y": y0,
+            "w": x1 - x0,
+            "h": y1 - y0,
+        }
+        print(f"[component-extract] fallback path={candidate_path} meta={meta}")
+        return candidate_path, meta
 
 
 # ---------- CLI for quick testing ----------
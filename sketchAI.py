@@ -1,5 +1,5 @@
-from PyQt6.QtCore import Qt, QPoint, QRect
-from PyQt6.QtGui import QPainter, QPen, QColor, QImage, QAction, QKeySequence
+from PyQt6.QtCore import Qt, QPoint, QRect, QSize, QTimer, QBuffer, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QPainter, QPen, QColor, QImage, QImageReader, QImageWriter, QPixmap, QPolygon, QAction, QKeySequence
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QColorDialog, QFileDialog, QSlider, QLabel, QCheckBox,
@@ -11,79 +11,205 @@ from ai_router import select_contract, DEFAULT_CONTRACTS
 from ai_fulfill import fulfill_contract, CONTRACT_SPECS
 from ai_component_graph import generate_component_graph
 from object_extract import extract_main_object_to_png, extract_component_from_bbox
+from ai_cache import AICache, HintCache
 
-import tempfile, os, traceback, sys, subprocess  
+import tempfile, os, traceback, sys, hashlib  
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Optional
 import json
 try:
     import yaml  # type: ignore
 except ImportError:
     yaml = None
 from datetime import datetime
+import numpy as np
+import cv2
 
 
 LAUNCH_BOILER_AFTER_QT: tuple[str, list[str]] | None = None  # (shell_path, args)
 
+
+def remove_temp(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
 class Canvas(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setAttribute(Qt.WidgetAttribute.WA_StaticContents)
         self.setMouseTracking(True)
-        self.image = QImage(self.size(), QImage.Format.Format_RGB32)
-        self.image.fill(Qt.GlobalColor.white)
+        # Strokes live in a display-native QPixmap so paintEvent is a plain blit;
+        # pixel-level users (save, hash, numpy) go through the `image` snapshot.
+        # The pixmap is a capacity buffer (grown to at least the screen size) and only
+        # its top-left view_size part is the canvas, so drag-resizing doesn't reallocate.
+        self.view_size = self.size()
+        self.pixmap = QPixmap(self.size())
+        self.pixmap.fill(Qt.GlobalColor.white)
 
         self.drawing = False
         self.last_pos = QPoint()
+        # Mouse samples waiting for the next event-loop turn; painted as one polyline
+        self._pending_points = []
+        self._flush_scheduled = False
+        self._dirty = False  # False only while the canvas is known to be all white
         self.brush_color = QColor(0, 0, 0)
         self.brush_size = 4
         self.eraser = False
+        # Pens are built once and only mutated by the setters, not per stroke flush
+        self._pen = QPen(self.brush_color, self.brush_size, Qt.PenStyle.SolidLine,
+                         Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin)
+        self._eraser_pen = QPen(QColor(Qt.GlobalColor.white), self.brush_size, Qt.PenStyle.SolidLine,
+                                Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin)
 
     def set_brush_color(self, color: QColor):
         self.brush_color = color
+        self._pen.setColor(color)
 
     def set_brush_size(self, size: int):
         self.brush_size = max(1, size)
+        self._pen.setWidth(self.brush_size)
+        self._eraser_pen.setWidth(self.brush_size)
 
     def set_eraser(self, on: bool):
         self.eraser = on
 
+    @property
+    def image(self) -> QImage:
+        """QImage copy of the canvas for pixel-level work (saving, hashing, numpy)."""
+        return self.pixmap.copy(QRect(QPoint(0, 0), self.view_size)).toImage()
+
+    def _ensure_capacity(self, size: QSize):
+        if size.width() <= self.pixmap.width() and size.height() <= self.pixmap.height():
+            return
+        screen = self.screen()
+        avail = screen.size() if screen is not None else size
+        grown = QPixmap(max(size.width(), avail.width(), self.pixmap.width()),
+                        max(size.height(), avail.height(), self.pixmap.height()))
+        grown.fill(Qt.GlobalColor.white)
+        painter = QPainter(grown)
+        painter.drawPixmap(0, 0, self.pixmap)
+        painter.end()
+        self.pixmap = grown
+
     def clear(self):
-        self.image.fill(Qt.GlobalColor.white)
+        self.pixmap.fill(Qt.GlobalColor.white)
+        self._dirty = False
         self.update()
 
+    # is_blank/png_bytes/content_hash/to_bgr each read back the whole canvas unless given
+    # `img`: callers needing several of them take one `image` snapshot and pass it along
+    def is_blank(self, img: Optional[QImage] = None) -> bool:
+        """True if every pixel is white (instant unless something was drawn or loaded)."""
+        if not self._dirty:
+            return True
+        # Strokes may have been erased back to white: check the pixels in one pass
+        img = (self.image if img is None else img).convertToFormat(QImage.Format.Format_RGB32)
+        ptr = img.constBits()
+        ptr.setsize(img.sizeInBytes())
+        rows = np.frombuffer(ptr, np.uint32).reshape(img.height(), img.bytesPerLine() // 4)
+        return bool(rows[:, :img.width()].min() == 0xFFFFFFFF)
+
     def save_png(self, path: str):
         self.image.save(path, "PNG")
 
+    def png_bytes(self, img: Optional[QImage] = None) -> bytes:
+        """Encode the canvas as PNG into memory (no temp file), favouring speed over size."""
+        buf = QBuffer()
+        buf.open(QBuffer.OpenModeFlag.ReadWrite)
+        writer = QImageWriter(buf, b"PNG")
+        # Qt's PNG writer maps quality to the zlib level as (100 - quality) * 9 // 91,
+        # so 80 selects level 1 (quality is the knob every Qt version honours for PNG)
+        writer.setQuality(80)
+        if not writer.write(self.image if img is None else img):
+            raise RuntimeError(f"PNG encode failed: {writer.errorString()}")
+        return bytes(buf.data())
+
+    def content_hash(self, img: Optional[QImage] = None) -> bytes:
+        """blake2b digest of the raw pixel buffer (read in place, no PNG encode)."""
+        img = self.image if img is None else img
+        ptr = img.constBits()
+        ptr.setsize(img.sizeInBytes())
+        h = hashlib.blake2b(f"{img.width()}x{img.height()}".encode(), digest_size=16)
+        h.update(memoryview(ptr))
+        return h.digest()
+
+    def to_bgr(self, img: Optional[QImage] = None) -> np.ndarray:
+        """Copy the canvas pixels into a BGR uint8 array (OpenCV layout) without a file."""
+        img = (self.image if img is None else img).convertToFormat(QImage.Format.Format_RGB888)
+        w, h = img.width(), img.height()
+        ptr = img.constBits()
+        ptr.setsize(img.sizeInBytes())
+        rows = np.frombuffer(ptr, np.uint8).reshape(h, img.bytesPerLine())
+        return np.ascontiguousarray(rows[:, :w * 3].reshape(h, w, 3)[..., ::-1])
+
     # load an external image and place it on the canvas
+    def _load_target(self) -> QSize:
+        if self.width() <= 0 or self.height() <= 0:
+            return QSize(800, 600)
+        return self.size()
+
     def load_image(self, path: str):
-        src = QImage(path)
+        target = self._load_target()
+
+        # Probe the header first and let the decoder shrink large images (e.g. a phone
+        # photo) straight to the fitted size instead of decoding them at full resolution
+        reader = QImageReader(path)
+        if not reader.canRead():
+            return
+        src_size = reader.size()
+        if src_size.isValid():
+            fitted = src_size.scaled(target, Qt.AspectRatioMode.KeepAspectRatio)
+            if fitted.width() < src_size.width():
+                reader.setScaledSize(fitted)
+        src = reader.read()
         if src.isNull():
             return
-        if self.width() <= 0 or self.height() <= 0:
-            target_size = (800, 600)
-            self.image = QImage(*target_size, QImage.Format.Format_RGB32)
-        else:
-            self.image = QImage(self.size(), QImage.Format.Format_RGB32)
+        self._place_image(src, target)
 
-        self.image.fill(Qt.GlobalColor.white)
-        scaled = src.scaled(self.image.size(), Qt.AspectRatioMode.KeepAspectRatio,
-                            Qt.TransformationMode.SmoothTransformation)
-        x = (self.image.width() - scaled.width()) // 2
-        y = (self.image.height() - scaled.height()) // 2
+    def load_image_from_bytes(self, data: bytes):
+        """Place an encoded image (e.g. a streamed AI preview) on the canvas."""
+        src = QImage.fromData(data)
+        if src.isNull():
+            return
+        self._place_image(src, self._load_target())
+
+    def save_state(self):
+        """Copy of the canvas contents for restore_state (e.g. around AI previews)."""
+        return self.pixmap.copy(), QSize(self.view_size), self._dirty
+
+    def restore_state(self, state):
+        self.pixmap, self.view_size, self._dirty = state
+        self._ensure_capacity(self.view_size)
+        self.update()
 
-        painter = QPainter(self.image)
+    def _place_image(self, src: QImage, target: QSize):
+        self._ensure_capacity(target)
+        self.view_size = target
+
+        self.pixmap.fill(Qt.GlobalColor.white)
+        scaled = src
+        if src.size() != src.size().scaled(target, Qt.AspectRatioMode.KeepAspectRatio):
+            scaled = src.scaled(target, Qt.AspectRatioMode.KeepAspectRatio,
+                                Qt.TransformationMode.SmoothTransformation)
+        x = (target.width() - scaled.width()) // 2
+        y = (target.height() - scaled.height()) // 2
+
+        painter = QPainter(self.pixmap)
         painter.drawImage(x, y, scaled)
         painter.end()
+        self._dirty = True
         self.update()
 
     def resizeEvent(self, event):
         if self.width() > 0 and self.height() > 0:
-            new_img = QImage(self.size(), QImage.Format.Format_RGB32)
-            new_img.fill(Qt.GlobalColor.white)
-            painter = QPainter(new_img)
-            painter.drawImage(0, 0, self.image)
-            painter.end()
-            self.image = new_img
+            self._ensure_capacity(self.size())
+            self.view_size = self.size()
         super().resizeEvent(event)
 
     def mousePressEvent(self, event):
@@ -100,34 +226,90 @@ class Canvas(QWidget):
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton and self.drawing:
             self.drawing = False
+            self._flush_stroke()
 
     def draw_line_to(self, end_pos: QPoint):
-        painter = QPainter(self.image)
-        color = QColor(Qt.GlobalColor.white) if self.eraser else self.brush_color
-        pen = QPen(color, self.brush_size, Qt.PenStyle.SolidLine,
-                   Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin)
-        painter.setPen(pen)
-        painter.drawLine(self.last_pos, end_pos)
+        # Queue the sample; every sample that arrives before the event loop idles
+        # is drawn by one _flush_stroke, with a single QPainter and update()
+        self._pending_points.append(end_pos)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            QTimer.singleShot(0, self._flush_stroke)
+
+    def _flush_stroke(self):
+        self._flush_scheduled = False
+        if not self._pending_points:
+            return
+        end_pos = self._pending_points[-1]
+        stroke = QPolygon([self.last_pos, *self._pending_points])
+        self._pending_points = []
+
+        painter = QPainter(self.pixmap)
+        painter.setPen(self._eraser_pen if self.eraser else self._pen)
+        painter.drawPolyline(stroke)
         painter.end()
+        self._dirty = True
+        # Repaint only the stroke's bounds, grown by the pen radius for the round caps
+        pad = self.brush_size // 2 + 1
+        self.update(stroke.boundingRect().adjusted(-pad, -pad, pad, pad))
         self.last_pos = end_pos
-        self.update()
 
     def paintEvent(self, event):
         canvas_painter = QPainter(self)
-        canvas_painter.drawImage(0, 0, self.image)
+        dirty = event.rect()
+        canvas_painter.drawPixmap(dirty, self.pixmap, dirty)
         canvas_painter.end()
 
 
+class WorkerSignals(QObject):
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    partial = pyqtSignal(bytes)  # optional progress payload, e.g. a preview PNG
+
+
+class AIWorker(QRunnable):
+    """Runs a blocking AI call on QThreadPool; results reach the GUI thread via signals."""
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Simple Draw (PyQt6)")
         self.canvas = Canvas()
+        self._ai_worker = None  # in-flight AIWorker, also blocks duplicate clicks
+        self._ai_fix_original = None  # canvas state from before AI Fix previews replaced it
         self.setCentralWidget(QWidget())
         layout = QVBoxLayout(self.centralWidget())
 
         # Controls
-        controls = QHBoxLayout()
+        self.controls = QHBoxLayout()
+        self._build_core_controls()
+
+        layout.addLayout(self.controls)
+        layout.addWidget(self.canvas, stretch=1)
+
+        self.resize(900, 600)
+        # The canvas and drawing tools show first; AI widgets, actions and caches are
+        # built on the first idle tick of the event loop
+        QTimer.singleShot(0, self._build_ai_controls)
+
+    def _build_core_controls(self):
+        controls = self.controls
 
         color_btn = QPushButton("Color")
         color_lbl = QLabel("Brush size:")
@@ -138,44 +320,24 @@ class MainWindow(QMainWindow):
         eraser_chk = QCheckBox("Eraser")
         clear_btn = QPushButton("Clear")
         save_btn = QPushButton("Save PNG")
-        import_btn = QPushButton("Import Image")
-        ai_fix_btn = QPushButton("AI Fix")
-        ai_playable_btn = QPushButton("AI Playable")
-
-        hint_lbl = QLabel("AI hint:")
-        self.ai_hint_input = QLineEdit()
-        self.ai_hint_input.setPlaceholderText("e.g., 'This is a piano; map keys to pitches.'")
-        self.ai_hint_input.setClearButtonEnabled(True)
-        self.ai_hint_input.setMinimumWidth(260)
-
-
+        self.import_btn = QPushButton("Import Image")
 
         controls.addWidget(color_btn)
         controls.addWidget(color_lbl)
         controls.addWidget(size_slider)
         controls.addWidget(eraser_chk)
         controls.addStretch(1)
-        controls.addWidget(hint_lbl)                    # NEW
-        controls.addWidget(self.ai_hint_input, 1)
-        controls.addWidget(import_btn)
-        controls.addWidget(ai_fix_btn)
-        controls.addWidget(ai_playable_btn)  # NEW
+        controls.addWidget(self.import_btn)
         controls.addWidget(clear_btn)
         controls.addWidget(save_btn)
 
-        layout.addLayout(controls)
-        layout.addWidget(self.canvas, stretch=1)
-
         # Wire up
         color_btn.clicked.connect(self.pick_color)
         size_slider.valueChanged.connect(self.canvas.set_brush_size)
         eraser_chk.toggled.connect(self.canvas.set_eraser)
         clear_btn.clicked.connect(self.canvas.clear)
         save_btn.clicked.connect(self.save_png)
-        import_btn.clicked.connect(self.import_image)
-        ai_fix_btn.clicked.connect(self.ai_fix_image)
-        ai_playable_btn.clicked.connect(self.ai_playable_mode)
-
+        self.import_btn.clicked.connect(self.import_image)
 
         # Menu/shortcuts
         save_action = QAction("Save", self)
@@ -193,6 +355,29 @@ class MainWindow(QMainWindow):
         open_action.triggered.connect(self.import_image)
         self.addAction(open_action)
 
+    def _build_ai_controls(self):
+        controls = self.controls
+        self.ai_cache = AICache()
+        self.hint_cache = HintCache()
+
+        hint_lbl = QLabel("AI hint:")
+        self.ai_hint_input = QLineEdit()
+        self.ai_hint_input.setPlaceholderText("e.g., 'This is a piano; map keys to pitches.'")
+        self.ai_hint_input.setClearButtonEnabled(True)
+        self.ai_hint_input.setMinimumWidth(260)
+        self.ai_fix_btn = QPushButton("AI Fix")
+        self.ai_playable_btn = QPushButton("AI Playable")
+
+        # Same order as before the split: ... stretch, hint, import, AI Fix, AI Playable, clear ...
+        idx = controls.indexOf(self.import_btn)
+        controls.insertWidget(idx, hint_lbl)
+        controls.insertWidget(idx + 1, self.ai_hint_input, 1)
+        controls.insertWidget(idx + 3, self.ai_fix_btn)
+        controls.insertWidget(idx + 4, self.ai_playable_btn)
+
+        self.ai_fix_btn.clicked.connect(self.ai_fix_image)
+        self.ai_playable_btn.clicked.connect(self.ai_playable_mode)
+
         ai_action = QAction("AI Fix", self)
         ai_action.setShortcut(QKeySequence("Ctrl+Shift+F"))
         ai_action.triggered.connect(self.ai_fix_image)
@@ -202,11 +387,6 @@ class MainWindow(QMainWindow):
         ai_playable_action.setShortcuts([QKeySequence("Ctrl+Shift+G"), QKeySequence("Meta+Shift+G")])
         ai_playable_action.triggered.connect(self.ai_playable_mode); self.addAction(ai_playable_action)
 
-
-
-
-        self.resize(900, 600)
-
     def pick_color(self):
         color = QColorDialog.getColor(self.canvas.brush_color, self, "Pick Color")
         if color.isValid():
@@ -228,51 +408,170 @@ class MainWindow(QMainWindow):
         if path:
             self.canvas.load_image(path)
 
+    def canvas_cache_key(self, img: QImage, *extra: str) -> str:
+        """AI cache key for the canvas snapshot `img` plus mode/prompt strings."""
+        return AICache.make_key(self.canvas.content_hash(img), *extra)
+
+    def _start_ai_worker(self, worker, on_done, on_failed):
+        self._ai_worker = worker  # keep the Python wrapper alive while the pool runs it
+        worker.signals.finished.connect(on_done)
+        worker.signals.failed.connect(on_failed)
+        self.ai_fix_btn.setEnabled(False)
+        self.ai_playable_btn.setEnabled(False)
+        QApplication.setOverrideCursor(Qt.CursorShape.BusyCursor)
+        QThreadPool.globalInstance().start(worker)
+
+    def _finish_ai_worker(self):
+        self._ai_worker = None
+        self.ai_fix_btn.setEnabled(True)
+        self.ai_playable_btn.setEnabled(True)
+        QApplication.restoreOverrideCursor()
+
+    def _refuse_blank_canvas(self, img: QImage) -> bool:
+        if not self.canvas.is_blank(img):
+            return False
+        QMessageBox.information(self, "Empty canvas", "Draw something on the canvas first.")
+        return True
+
     def ai_fix_image(self):
-        try:
-            fd, temp_in_path = tempfile.mkstemp(prefix="canvas_", suffix=".png")
-            os.close(fd)
-            self.canvas.image.save(temp_in_path, "PNG")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to snapshot canvas:\n{e}")
+        if self._ai_worker is not None:
+            return
+        img = self.canvas.image  # one readback serves the blank check, hash and PNG
+        if self._refuse_blank_canvas(img):
             return
-
         user_hint = self.ai_hint_input.text().strip()
         prompt = ("Generate a cleaned up version of this image. "
                   "Keep everything the same, just make the lines straight "
                   "(or smoothly curved when appropriate) and the text look nice.")
         if user_hint:
             prompt += f"\nAdditional context from the user: {user_hint}"
-        try:
-            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
-            result = generate_image_with_gpt5(temp_in_path, prompt)
-            png_path = result[0] if isinstance(result, tuple) else result
-            if not png_path or not os.path.exists(png_path):
-                raise RuntimeError("AI did not return a valid PNG path.")
-            self.canvas.load_image(png_path)
-        except Exception as e:
-            traceback.print_exc()
-            QMessageBox.critical(self, "AI Fix Failed", f"{e}")
-        finally:
-            QApplication.restoreOverrideCursor()
-            try:
-                os.remove(temp_in_path)
-            except Exception:
-                pass
 
-    def ai_playable_mode(self):
-        # 1) Snapshot canvas -> temp PNG
+        cache_key = self.canvas_cache_key(img, "fix", prompt)
+        cached = self.ai_cache.get(cache_key)
+        if cached:
+            print(f"[ai-fix] cache hit {cached}")
+            self.canvas.load_image(cached)
+            return
+
         try:
-            fd, temp_png = tempfile.mkstemp(prefix="canvas_boiler_", suffix=".png")
-            os.close(fd)
-            self.canvas.image.save(temp_png, "PNG")
-            print(f"[ai-playable] snapshot={temp_png}")
+            png_bytes = self.canvas.png_bytes(img)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to snapshot canvas:\n{e}")
             return
 
+        worker = AIWorker(generate_image_with_gpt5, png_bytes, prompt)
+        # Stream partial previews onto the canvas while the final image renders. They
+        # replace the drawing, so keep it for a failed run and lock the canvas meanwhile
+        worker.kwargs["on_partial"] = worker.signals.partial.emit
+        worker.signals.partial.connect(self.canvas.load_image_from_bytes)
+        self._ai_fix_original = self.canvas.save_state()
+        self.canvas.setEnabled(False)
+        self._start_ai_worker(
+            worker,
+            lambda result: self._on_ai_fix_done(result, cache_key),
+            self._on_ai_fix_failed,
+        )
+
+    def _end_ai_fix_preview(self, restore: bool):
+        original, self._ai_fix_original = self._ai_fix_original, None
+        if restore and original is not None:
+            self.canvas.restore_state(original)
+        self.canvas.setEnabled(True)
+
+    def _on_ai_fix_done(self, result, cache_key):
+        self._finish_ai_worker()
+        png_path = result[0] if isinstance(result, tuple) else result
+        if not png_path or not os.path.exists(png_path):
+            self._end_ai_fix_preview(restore=True)
+            QMessageBox.critical(self, "AI Fix Failed", "AI did not return a valid PNG path.")
+            return
+        self._end_ai_fix_preview(restore=False)
+        self.canvas.load_image(png_path)
+        try:
+            self.ai_cache.put(cache_key, png_path)
+        except OSError as cache_err:
+            print("[ai-fix] cache write failed:", cache_err)
+
+    def _on_ai_fix_failed(self, message):
+        self._finish_ai_worker()
+        self._end_ai_fix_preview(restore=True)
+        QMessageBox.critical(self, "AI Fix Failed", message)
+
+    def ai_playable_mode(self):
+        if self._ai_worker is not None:
+            return
+        img = self.canvas.image  # one readback serves the blank check, hash and snapshot
+        if self._refuse_blank_canvas(img):
+            return
         user_hint = self.ai_hint_input.text().strip()
         print(f"[ai-playable] user_hint='{user_hint}'")
+        canvas_hash = self.canvas.content_hash(img)
+        cache_key = AICache.make_key(canvas_hash, "playable", user_hint)
+
+        # 1) Snapshot canvas -> array + temp PNG
+        with self.canvas_snapshot(img) as snap:
+            if snap is None:
+                return
+            temp_png = snap.path
+
+            # Same canvas + hint as an earlier run whose outputs still exist: relaunch those
+            cached = self.ai_cache.get_json(cache_key)
+            if cached and os.path.isfile(cached.get("module_path") or ""):
+                print(f"[ai-playable] cache hit {cached}")
+                snap.keep = True  # _launch_boiler hands the file to the shell
+                self._launch_playable(temp_png, cached)
+                return
+
+            self._start_ai_worker(
+                AIWorker(self._playable_pipeline, temp_png, snap.bgr, user_hint, canvas_hash.hex()),
+                lambda result: self._on_playable_done(result, temp_png, cache_key),
+                lambda message: self._on_playable_failed(message, temp_png),
+            )
+            snap.keep = True  # owned by the worker's done/failed slot from here on
+
+    @contextmanager
+    def canvas_snapshot(self, img: Optional[QImage] = None):
+        """
+        Write the canvas (or its snapshot `img`) to a temp PNG (fast zlib level; it is
+        read once and deleted) and yield it as snap.path / snap.bgr, or None after
+        reporting a failure. The file is removed when the block exits unless the block
+        sets snap.keep to hand it on.
+        """
+        fd, path = tempfile.mkstemp(prefix="canvas_boiler_", suffix=".png")
+        os.close(fd)
+        snap = None
+        try:
+            try:
+                bgr = self.canvas.to_bgr(img)
+                if not cv2.imwrite(path, bgr, [cv2.IMWRITE_PNG_COMPRESSION, 1]):
+                    raise RuntimeError(f"Failed to write {path}")
+                snap = SimpleNamespace(path=path, bgr=bgr, keep=False)
+                print(f"[ai-playable] snapshot={path}")
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Failed to snapshot canvas:\n{e}")
+            yield snap
+        finally:
+            if snap is None or not snap.keep:
+                remove_temp(path)
+
+    def _playable_pipeline(self, temp_png, canvas_bgr, user_hint, canvas_hash):
+        """
+        Steps 2-4 of AI Playable. Runs on a worker thread, so it must not touch widgets:
+        non-fatal problems are returned in "warnings", fatal ones raise.
+        Returns the launch manifest (module_path, sprite_meta, component_json_path).
+        """
+        # Same canvas with a reworded hint: reuse that run (embedding the hint may load a
+        # model, which is why this lookup happens here rather than on the GUI thread)
+        try:
+            similar = self.hint_cache.lookup(canvas_hash, user_hint)
+        except Exception as e:
+            print("[ai-playable] hint cache lookup failed:", e)
+            similar = None
+        if similar and os.path.isfile(similar.get("module_path") or ""):
+            print(f"[ai-playable] similar-hint cache hit {similar}")
+            return {**similar, "warnings": []}
+
+        warnings = []
         sprite_path = None
         sprite_meta = None
         graph_yaml_text = None
@@ -287,7 +586,7 @@ class MainWindow(QMainWindow):
             stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             candidate_out = str(sprites_dir / f"sprite_{stamp}.png")
 
-            sprite_path, meta = extract_main_object_to_png(temp_png, candidate_out)
+            sprite_path, meta = extract_main_object_to_png(canvas_bgr, candidate_out)
             # meta: {"x": int, "y": int, "w": int, "h": int}
             sprite_meta = {"path": sprite_path, **meta}
             print('[ai-playable] sprite_meta', sprite_meta)
@@ -297,7 +596,6 @@ class MainWindow(QMainWindow):
 
         # 3) Router Step 1: choose a contract from the image + hint
         try:
-            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
             choice = select_contract(temp_png, user_hint or "(no hint)", contracts=DEFAULT_CONTRACTS, model="gpt-5", temperature=0.1)
             contract_id = choice.get("contract_id", "physical_object")
             confidence = choice.get("confidence", 0.0)
@@ -306,11 +604,9 @@ class MainWindow(QMainWindow):
             print(f"[Router] assumptions={choice.get('assumptions')}")
         except Exception as e:
             traceback.print_exc()
-            QApplication.restoreOverrideCursor()
             # Fallback to a sensible default
             contract_id = "physical_object"
-            QMessageBox.warning(self, "Router Failed",
-                                f"Falling back to '{contract_id}'\nReason: {e}")
+            warnings.append(("Router Failed", f"Falling back to '{contract_id}'\nReason: {e}"))
             print("[ai-playable] router failure, fallback contract used")
 
         # 3.5) Generate component graph and extract per-node sprites
@@ -360,6 +656,7 @@ class MainWindow(QMainWindow):
             print(f"[ai-playable] extracting components: {len(graph_nodes)} nodes")
             components_dir = Path(__file__).resolve().parent / "games" / "components"
             components_dir.mkdir(parents=True, exist_ok=True)
+            tasks = []
             for idx, node in enumerate(graph_nodes):
                 bbox = node.get("bbox") if isinstance(node, dict) else None
                 node_id = node.get("id") if isinstance(node, dict) else None
@@ -370,19 +667,35 @@ class MainWindow(QMainWindow):
                     continue
                 slug = node_id or f"node_{idx}"
                 comp_path = str(components_dir / f"component_{stamp}_{slug}.png")
+                tasks.append((node, slug, label, bbox, comp_path))
+
+            def extract_task(task):
+                _, slug, _, bbox, comp_path = task
                 try:
-                    sprite_file, meta = extract_component_from_bbox(temp_png, bbox, comp_path)
-                    components.append({
-                        "id": slug,
-                        "label": label or slug,
-                        "role": node.get("role", ""),
-                        "description": node.get("description", ""),
-                        "path": sprite_file,
-                        "meta": meta,
-                    })
-                    print(f"[ai-playable] component saved path={sprite_file} meta={meta}")
+                    return extract_component_from_bbox(canvas_bgr, bbox, comp_path)
                 except Exception as comp_err:
                     print(f"Component extraction failed for {slug}:", comp_err)
+                    return None
+
+            # Nodes are independent crops of the same array and cv2 releases the GIL,
+            # so a thread pool extracts them in parallel; map keeps the node order
+            results = []
+            if tasks:
+                with ThreadPoolExecutor(max_workers=min(len(tasks), os.cpu_count() or 1)) as pool:
+                    results = list(pool.map(extract_task, tasks))
+            for (node, slug, label, _, _), result in zip(tasks, results):
+                if result is None:
+                    continue
+                sprite_file, meta = result
+                components.append({
+                    "id": slug,
+                    "label": label or slug,
+                    "role": node.get("role", ""),
+                    "description": node.get("description", ""),
+                    "path": sprite_file,
+                    "meta": meta,
+                })
+                print(f"[ai-playable] component saved path={sprite_file} meta={meta}")
 
         if components:
             component_payload = {
@@ -401,36 +714,63 @@ class MainWindow(QMainWindow):
             print("[ai-playable] no components captured")
 
         # 4) Router Step 2: fulfill the chosen contract -> write objects module
+        print(f"[ai-playable] fulfilling contract {contract_id}")
+        module_path = fulfill_contract(
+            image_path=temp_png,
+            contract_id=contract_id,
+            user_hint=user_hint,
+            sprite_meta=sprite_meta,        # None is fine if extraction failed
+            component_graph_yaml=graph_yaml_text,
+            components=component_payload.get("components") if component_payload else None,
+            out_dir="games",
+            base_name="objects",
+            model="gpt-5",
+        )
+        print(f"[ai-playable] module_path={module_path}")
+        manifest = {
+            "module_path": os.path.abspath(module_path),
+            "sprite_meta": sprite_meta if sprite_path else None,
+            "component_json_path": str(component_json_path) if component_json_path else None,
+        }
         try:
-            print(f"[ai-playable] fulfilling contract {contract_id}")
-            module_path = fulfill_contract(
-                image_path=temp_png,
-                contract_id=contract_id,
-                user_hint=user_hint,
-                sprite_meta=sprite_meta,        # None is fine if extraction failed
-                component_graph_yaml=graph_yaml_text,
-                components=component_payload.get("components") if component_payload else None,
-                out_dir="games",
-                base_name="objects",
-                model="gpt-5",
-            )
-            print(f"[ai-playable] module_path={module_path}")
+            self.hint_cache.add(canvas_hash, user_hint, manifest)
         except Exception as e:
-            traceback.print_exc()
-            QApplication.restoreOverrideCursor()
-            QMessageBox.critical(self, "AI Play Failed", f"{e}")
-            try: os.remove(temp_png)
-            except Exception: pass
-            return
-        finally:
-            QApplication.restoreOverrideCursor()
-
+            print("[ai-playable] hint cache write failed:", e)
+        return {**manifest, "warnings": warnings}
+
+    def _on_playable_done(self, result, temp_png, cache_key):
+        self._finish_ai_worker()
+        warnings = result.pop("warnings")
+        for title, text in warnings:
+            QMessageBox.warning(self, title, text)
+        try:
+            self.ai_cache.put_json(cache_key, result)
+        except OSError as cache_err:
+            print("[ai-playable] cache write failed:", cache_err)
+        self._launch_playable(temp_png, result)
+
+    def _launch_playable(self, temp_png, manifest):
+        sprite_meta = manifest.get("sprite_meta")
+        component_json_path = manifest.get("component_json_path")
+        self._launch_boiler(
+            temp_png,
+            manifest["module_path"],
+            sprite_meta["path"] if sprite_meta else None,
+            sprite_meta,
+            Path(component_json_path) if component_json_path else None,
+        )
+
+    def _on_playable_failed(self, message, temp_png):
+        self._finish_ai_worker()
+        QMessageBox.critical(self, "AI Play Failed", message)
+        remove_temp(temp_png)
+
+    def _launch_boiler(self, temp_png, module_path, sprite_path, sprite_meta, component_json_path):
         # 5) Launch boiler with PNG + generated module (+ sprite if available)
         shell_path = str(Path(__file__).resolve().parent / "game_shell.py")
         if not os.path.isfile(shell_path):
             QMessageBox.critical(self, "Error", f"game_shell.py not found at:\n{shell_path}")
-            try: os.remove(temp_png)
-            except Exception: pass
+            remove_temp(temp_png)
             return
 
         args = [temp_png, "--module", module_path]
@@ -462,10 +802,18 @@ def main():
         try:
             print("launching:", shell_path)
             print("args:", args)
-            subprocess.run([sys.executable, shell_path, *args], check=False)
+            if "--subprocess" in sys.argv:
+                # Replace this process with a fresh interpreter running the shell (no fork,
+                # no waiting parent); execv skips our finally, so the shell deletes the PNG
+                os.environ["UMEDA_CLEANUP_PATH"] = args[0]
+                sys.stdout.flush()
+                os.execv(sys.executable, [sys.executable, shell_path, *args])
+            else:
+                # Same interpreter: skips a fresh Python start and re-importing numpy/cv2
+                import game_shell
+                game_shell.run([shell_path, *args])
         finally:
-            try: os.remove(args[0])  # remove the temp PNG snapshot
-            except Exception: pass
+            remove_temp(args[0])  # the temp PNG snapshot
 
     sys.exit(exit_code)
 